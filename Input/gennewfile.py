@@ -1,71 +1,44 @@
 import pandas as pd
 import numpy as np
-import random
-from datetime import datetime, timedelta
 
 # Configuration
-products = ["bond", "future", "irdswap", "repo"]
-pillars = ["100Y", "10Y", "15Y", "1M", "1W", "1Y", "20Y", "25Y", "2Y", "30Y", "3M", "40Y", "50Y"]
-start_date = datetime(2023, 1, 1)
-end_date = datetime(2025, 12, 31)
+products = np.array(["bond", "future", "irdswap", "repo"])
+pillars = np.array(["100Y", "10Y", "15Y", "1M", "1W", "1Y", "20Y", "25Y", "2Y", "30Y", "3M", "40Y", "50Y"])
+start_date = pd.Timestamp(2023, 1, 1)
+end_date = pd.Timestamp(2025, 12, 31)
 n_samples = 2000  # total number of rows to generate
 
-# Helper to generate a random date string in MM/DD/YYYY format
-def random_date(start, end):
-    return (start + timedelta(days=random.randint(0, (end - start).days))).strftime("%m/%d/%Y")
+rng = np.random.default_rng()
 
-# Generate base rows, one per pillar to ensure coverage
-rows = []
+# Base rows, one per pillar to ensure coverage, then random pillars for the remaining rows
+row_pillars = np.concatenate([pillars, rng.choice(pillars, size=n_samples - len(pillars))])
 
-for pillar in pillars:
-    if pillar == "100Y":
-        product = "bond"
-    elif pillar == "10Y":
-        product = "future"
-    else:
-        product = random.choice(products)
+# Products are random, except 100Y which is always a bond and 10Y always a future
+row_products = rng.choice(products, size=n_samples)
+row_products[row_pillars == "100Y"] = "bond"
+row_products[row_pillars == "10Y"] = "future"
 
-    pricingdate = random_date(start_date, end_date)
-    cv_value = round(random.uniform(0, 1), 4)
-    outlier = None if product == "irdswap" else (1 if random.random() < 0.1 else 0)
-    auction_date = 1 if random.random() < 0.5 else 0
+# Random pricing dates in MM/DD/YYYY format
+day_offsets = rng.integers(0, (end_date - start_date).days, size=n_samples, endpoint=True)
+pricingdates = (start_date + pd.to_timedelta(day_offsets, unit="D")).strftime("%m/%d/%Y")
 
-    rows.append({
-        "Product": product,
-        "Projected Pillar": pillar,
-        "pricingdate": pricingdate,
-        "Validated Value Projected CV": cv_value,
-        "Outlier": outlier,
-        "is Auction Date": auction_date
-    })
+cv_values = np.round(rng.uniform(0, 1, size=n_samples), 4)
 
-# Fill remaining rows to reach n_samples
-while len(rows) < n_samples:
-    pillar = random.choice(pillars)
+# Outliers are flagged for ~10% of rows and left empty for irdswap
+outliers = (rng.random(n_samples) < 0.1).astype(float)
+outliers[row_products == "irdswap"] = np.nan
 
-    if pillar == "100Y":
-        product = "bond"
-    elif pillar == "10Y":
-        product = "future"
-    else:
-        product = random.choice(products)
-
-    pricingdate = random_date(start_date, end_date)
-    cv_value = round(random.uniform(0, 1), 4)
-    outlier = None if product == "irdswap" else (1 if random.random() < 0.1 else 0)
-    auction_date = 1 if random.random() < 0.5 else 0
-
-    rows.append({
-        "Product": product,
-        "Projected Pillar": pillar,
-        "pricingdate": pricingdate,
-        "Validated Value Projected CV": cv_value,
-        "Outlier": outlier,
-        "Is Auction Date": auction_date
-    })
+auction_dates = (rng.random(n_samples) < 0.5).astype(np.int8)
 
 # Build and shuffle DataFrame
-df = pd.DataFrame(rows)
+df = pd.DataFrame({
+    "Product": row_products,
+    "Projected Pillar": row_pillars,
+    "pricingdate": pricingdates,
+    "Validated Value Projected CV": cv_values,
+    "Outlier": outliers,
+    "Is Auction Date": auction_dates
+})
 df = df.sample(frac=1).reset_index(drop=True)
 
 # Optional: Validate rules
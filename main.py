@@ -233,20 +233,22 @@ def create_time_series_plots(
 
     import pandas as pd
     # We'll extract the full data DataFrame from the visualizer.
-    full_data = visualizer.data.copy()
+    full_data = visualizer.data
 
     max_workers = min(16, max(1, len(mother_metrics)))
     futures = []
     # Keep track of which future belongs to which metric for better logging
     future_to_metric = {}
 
+    # Filter only the relevant data for this strana_node; boolean indexing already
+    # returns a new frame, and every metric shares the same slice
+    mask = (full_data['stranaNodeName'] == strana_node)
+    data_slice = full_data[mask]
+
     with ProcessPoolExecutor(max_workers=max_workers) as executor:
         for metric in mother_metrics:
             output_filename_local = f'{strana_node}_{metric}_timeseries.html'
             output_file_path_local = str(output_dir / output_filename_local)
-            # Filter only the relevant data for this metric and strana_node
-            mask = (full_data['stranaNodeName'] == strana_node)
-            data_slice = full_data[mask].copy()
             # Pass only the data for this strana_node (DataVisualizer will further filter by metric)
             future = executor.submit(generate_single_time_series_plot, metric, strana_node, data_slice, output_file_path_local, event_dates)
             futures.append(future)
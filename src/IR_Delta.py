@@ -1,4 +1,5 @@
 import pandas as pd
+import numpy as np
 import math
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
@@ -21,6 +22,132 @@ def get_maturity_in_years(maturity_str):
     else:
         raise ValueError(f"Unrecognized maturity unit in '{maturity_str}'")
 
+# Column types for IR Delta extracts, applied while the CSV is parsed.
+IR_DELTA_DTYPES = {
+    'Product': 'category',
+    'Projected Pillar': 'category',
+    'Validated Value Projected CV': 'float32',
+    'Outlier': 'Int8',
+    'Is Auction Date': 'Int8',
+}
+
+def _add_auction_lines(fig, auction_dates, row=None, col=None, **trace_args):
+    """
+    Adds a single Scattergl trace drawing a vertical grey line at every auction date.
+    The segments are joined into one trace, separated by gaps, instead of adding one
+    layout shape per date. They are drawn against a hidden y axis with range [0, 1]
+    overlaying the plot's own, so each line spans the full plot height like a vline.
+
+    Parameters:
+        fig (plotly.graph_objects.Figure): Figure to add the lines to.
+        auction_dates (iterable): Dates at which to draw the lines.
+        row (int, optional): Subplot row, for figures made with make_subplots.
+        col (int, optional): Subplot column, for figures made with make_subplots.
+        **trace_args: Extra Scattergl arguments (e.g. name, legendgroup).
+    """
+    if row is None:
+        xref, yref = 'x', 'y'
+    else:
+        subplot = fig.get_subplot(row, col)
+        xref = subplot.xaxis.plotly_name.replace('axis', '')
+        yref = subplot.yaxis.plotly_name.replace('axis', '')
+    overlay_yref = f'y{len(list(fig.select_yaxes())) + 1}'
+    fig.update_layout({
+        overlay_yref.replace('y', 'yaxis', 1): dict(
+            overlaying=yref, anchor=xref, range=[0, 1], visible=False, fixedrange=True
+        )
+    })
+
+    auction_dates = list(pd.DatetimeIndex(auction_dates))
+    n_dates = len(auction_dates)
+    x = np.empty(3 * n_dates, dtype=object)
+    x[0::3] = auction_dates
+    x[1::3] = auction_dates
+    x[2::3] = None
+    y = np.tile([0, 1, np.nan], n_dates)
+    fig.add_trace(go.Scattergl(
+        x=x, y=y,
+        xaxis=xref, yaxis=overlay_yref,
+        mode='lines',
+        line=dict(color='lightgrey', width=1),
+        hoverinfo='skip',
+        showlegend=False,
+        **trace_args
+    ))
+
+def _strip_labels(series):
+    """
+    Strips surrounding whitespace from label values. Categorical columns are cleaned on
+    their categories only and stay categorical; other columns are cast to str first.
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.map(lambda label: str(label).strip())
+    return series.astype(str).str.strip()
+
+def compute_outliers(values, groups, k=3.0):
+    """
+    Flags values lying more than k standard deviations from the mean of their group.
+    Group means and standard deviations are accumulated with np.bincount, so the whole
+    array is processed in a few vectorized passes rather than one pass per group.
+
+    Parameters:
+        values (array-like): Values to check; NaN values are never flagged.
+        groups (array-like): Integer group code per value (e.g. from DataFrame.groupby().ngroup());
+            negative codes mark rows without a group and are never flagged.
+        k (float, optional): Number of standard deviations beyond which a value is an outlier.
+
+    Returns:
+        flags (numpy.ndarray): Boolean mask, True where the value is an outlier.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    groups = np.asarray(groups, dtype=np.int64)
+    valid = (groups >= 0) & ~np.isnan(values)
+    codes = groups[valid]
+    vals = values[valid]
+    n_groups = int(codes.max()) + 1 if codes.size else 0
+
+    counts = np.bincount(codes, minlength=n_groups)
+    sums = np.bincount(codes, weights=vals, minlength=n_groups)
+    means = np.divide(sums, counts, out=np.zeros(n_groups), where=counts > 0)
+    deviations = vals - means[codes]
+    squares = np.bincount(codes, weights=deviations ** 2, minlength=n_groups)
+    stds = np.sqrt(np.divide(squares, counts, out=np.zeros(n_groups), where=counts > 0))
+
+    flags = np.zeros(values.shape, dtype=bool)
+    flags[valid] = np.abs(deviations) > k * stds[codes]
+    return flags
+
+def load_data(csv_path):
+    """
+    Loads an IR Delta CSV with column types and pricing dates resolved by the parser,
+    so the plotting functions do not need a second coercion pass over the data.
+
+    Parameters:
+        csv_path (str): Path to the IR Delta CSV file.
+
+    Returns:
+        df (pandas.DataFrame): DataFrame with parsed 'pricingdate' values; rows without a
+        valid pricing date are dropped. If the file has no 'Outlier' column, one is derived
+        per Projected Pillar with compute_outliers.
+    """
+    header = pd.read_csv(csv_path, nrows=0).columns
+    df = pd.read_csv(
+        csv_path,
+        dtype={col: dtype for col, dtype in IR_DELTA_DTYPES.items() if col in header},
+        parse_dates=['pricingdate'],
+        date_format='%m/%d/%Y',
+        engine='c',
+    )
+    df.dropna(subset=['pricingdate'], inplace=True)
+
+    if 'Outlier' not in df.columns:
+        flags = compute_outliers(
+            df['Validated Value Projected CV'].to_numpy(),
+            df.groupby('Projected Pillar', observed=True).ngroup().to_numpy(),
+        )
+        df['Outlier'] = pd.array(flags.astype(np.int8), dtype=IR_DELTA_DTYPES['Outlier'])
+    return df
+
 def generate_time_series_plots(df, specific_pillar=None, fig_width=1800, plot_height=400):
     """
     Creates time series plots for each Projected Pillar with all available products.
@@ -44,7 +171,7 @@ def generate_time_series_plots(df, specific_pillar=None, fig_width=1800, plot_he
         df (pandas.DataFrame): DataFrame containing the following columns:
             'Product': Categories (e.g., 'bond', 'future', 'irdswap', 'repo')
             'Projected Pillar': Maturity identifiers (e.g., '6M', '10Y', '15Y', '1M', etc.)
-            'pricingdate': Date string in format '%m/%d/%Y' (e.g., '2/28/2023')
+            'pricingdate': Date string in format '%m/%d/%Y' (e.g., '2/28/2023') or parsed datetimes (see load_data)
             'Validated Value Projected CV': Float values.
             'Outlier': Binary indicator (0/1), with potential nulls for 'irdswap'
             'Is Auction Date': Binary indicator (0/1)
@@ -69,10 +196,12 @@ def generate_time_series_plots(df, specific_pillar=None, fig_width=1800, plot_he
         'future': 'green'
     }
 
-    # Data cleaning.
-    df['Projected Pillar'] = df['Projected Pillar'].astype(str).str.strip()
-    df['Product'] = df['Product'].astype(str).str.strip()
-    df['pricingdate'] = pd.to_datetime(df['pricingdate'], format='%m/%d/%Y', errors='coerce')
+    # Data cleaning on a new frame, leaving the caller's DataFrame untouched.
+    df = df.assign(**{
+        'Projected Pillar': _strip_labels(df['Projected Pillar']),
+        'Product': _strip_labels(df['Product']),
+        'pricingdate': pd.to_datetime(df['pricingdate'], format='%m/%d/%Y', errors='coerce'),
+    })
 
     if specific_pillar:
         specific_pillar = specific_pillar.strip()
@@ -90,24 +219,52 @@ def generate_time_series_plots(df, specific_pillar=None, fig_width=1800, plot_he
     # Arrange subplots: 2 per row.
     num_cols = 2
     num_rows = math.ceil(n_pillars / num_cols)
-    fig = make_subplots(rows=num_rows, cols=num_cols, subplot_titles=pillar_list)
+    fig = make_subplots(
+        rows=num_rows, cols=num_cols, subplot_titles=pillar_list,
+        x_title="pricingdate", y_title="Validated Value Projected CV"
+    )
+
+    # Order rows by (pillar, product, date) once and pull the plotted columns out as
+    # numpy arrays, so every (pillar, product) series is a contiguous slice of them.
+    pillar_codes, pillar_labels = pd.factorize(df['Projected Pillar'])
+    product_codes, product_labels = pd.factorize(df['Product'])
+    order = np.lexsort((df['pricingdate'].to_numpy(), product_codes, pillar_codes))
+    dates = df['pricingdate'].to_numpy()[order]
+    values = df['Validated Value Projected CV'].to_numpy()[order]
+    is_outlier = (df['Outlier'] == 1).to_numpy(dtype=bool, na_value=False)[order]
+    is_auction = (df['Is Auction Date'] == 1).to_numpy(dtype=bool, na_value=False)[order]
+    pillar_codes = pillar_codes[order]
+    product_codes = product_codes[order]
+
+    # Slices per product within each pillar, plus the slice spanning the whole pillar.
+    product_slices = {}
+    pillar_slices = {}
+    if len(order):
+        breaks = np.flatnonzero(
+            (np.diff(pillar_codes) != 0) | (np.diff(product_codes) != 0)
+        ) + 1
+        for start, end in zip(np.r_[0, breaks], np.r_[breaks, len(order)]):
+            pillar_code, product_code = pillar_codes[start], product_codes[start]
+            if pillar_code < 0 or product_code < 0:
+                continue  # Rows with a missing pillar or product are not plotted.
+            pillar = pillar_labels[pillar_code]
+            product_slices.setdefault(pillar, {})[product_labels[product_code]] = slice(start, end)
+            pillar_start = pillar_slices[pillar].start if pillar in pillar_slices else start
+            pillar_slices[pillar] = slice(pillar_start, end)
 
     # Iterate over each pillar (subplot).
     for i, pillar in enumerate(pillar_list):
         row = i // num_cols + 1
         col = i % num_cols + 1
 
-        # Filter data for the current pillar and sort by date.
-        pillar_df = df[df['Projected Pillar'] == pillar].sort_values(by='pricingdate')
-        product_list = sorted(pillar_df['Product'].dropna().unique())
+        pillar_products = product_slices.get(pillar, {})
+        product_list = sorted(pillar_products)
 
         # Flag to check if the legend group title for this pillar has been added.
         grouptitleadded = False
 
         for product in product_list:
-            product_df = pillar_df[pillar_df['Product'] == product].sort_values(by='pricingdate')
-            if product_df.empty:
-                continue
+            sl = pillar_products[product]
 
             # Determine product color.
             product_key = product.lower()
@@ -130,53 +287,45 @@ def generate_time_series_plots(df, specific_pillar=None, fig_width=1800, plot_he
                     "showlegend": True
                 }
 
-            # Main trace for the product line.
+            # Product line, rendered with WebGL as series can be long. Outliers are drawn
+            # as per-point markers on the same trace (different colors for bond and
+            # future), while all other points get size 0 markers.
+            outlier_mask = is_outlier[sl]
+            if outlier_mask.any():
+                outlier_color = outlier_color_map.get(product_key, 'yellow') # Default to yellow if not specified.
+                marker_args = {
+                    "mode": 'lines+markers',
+                    "marker": dict(
+                        color=np.where(outlier_mask, outlier_color, prod_color),
+                        size=np.where(outlier_mask, 7, 0),
+                        symbol=np.where(outlier_mask, 'triangle-up', 'circle'),
+                    ),
+                }
+            else:
+                marker_args = {"mode": 'lines'}
+
             fig.add_trace(
-                go.Scatter(
-                    x=product_df['pricingdate'],
-                    y=product_df['Validated Value Projected CV'],
-                    mode='lines',
+                go.Scattergl(
+                    x=dates[sl],
+                    y=values[sl],
                     line=dict(width=2, color=prod_color),
+                    **marker_args,
                     **legend_args
                 ),
                 row=row, col=col
             )
 
-            # Outlier markers with different colors for bond and future.
-            product_outliers = product_df[product_df['Outlier'] == 1]
-            if not product_outliers.empty:
-                outlier_color = outlier_color_map.get(product_key, 'yellow') # Default to yellow if not specified.
-                fig.add_trace(
-                    go.Scatter(
-                        x=product_outliers['pricingdate'],
-                        y=product_outliers['Validated Value Projected CV'],
-                        mode='markers',
-                        marker=dict(color=outlier_color, size=7, symbol='triangle-up'),
-                        name=f"{product} Outlier",
-                        legendgroup=pillar,
-                        showlegend=False
-                    ),
-                    row=row, col=col
-                )
-
-        # Auction dates: add vertical grey lines.
-        # Note: This part uses product_df, which refers to the *last* product in the loop for auction dates.
-        # If auction dates are common for the pillar, this is fine. If they are product-specific,
-        # this might need adjustment or use pillar_df for auction dates if applicable.
-        if not pillar_df.empty: # Use pillar_df to find auction dates for the whole pillar
-            pillar_auction_dates = pillar_df[pillar_df['Is Auction Date'] == 1]['pricingdate'].unique()
-            for auction_date in pillar_auction_dates:
-                fig.add_vline(
-                    x=auction_date,
-                    line=dict(color='lightgrey', width=1),
-                    row=row,
-                    col=col
+        # Auction dates: add full-height vertical grey lines, using the auction dates of
+        # the whole pillar, as one trace per subplot.
+        if product_list:
+            pillar_sl = pillar_slices[pillar]
+            pillar_auction_dates = pd.DatetimeIndex(np.unique(dates[pillar_sl][is_auction[pillar_sl]]))
+            if len(pillar_auction_dates):
+                _add_auction_lines(
+                    fig, pillar_auction_dates, row=row, col=col,
+                    name='Auction Date', legendgroup=pillar
                 )
 
-        # Set axis titles for this subplot.
-        fig.update_xaxes(title_text="pricingdate", row=row, col=col)
-        fig.update_yaxes(title_text="Validated Value Projected CV", row=row, col=col)
-
     # Update overall layout.
     fig.update_layout(
         height=plot_height * num_rows,
@@ -196,7 +345,7 @@ def generate_product_sum_plot(df, fig_width=1800, plot_height=600):
     Parameters:
         df (pandas.DataFrame): DataFrame containing the following columns:
             'Product': Categories (e.g., 'bond', 'future', 'irdswap', 'repo')
-            'pricingdate': Date string in format '%m/%d/%Y' (e.g., '2/28/2023')
+            'pricingdate': Date string in format '%m/%d/%Y' (e.g., '2/28/2023') or parsed datetimes (see load_data)
             'Validated Value Projected CV': Float values.
             'Is Auction Date': Binary indicator (0/1)
         fig_width (int, optional): The overall figure width.
@@ -215,9 +364,10 @@ def generate_product_sum_plot(df, fig_width=1800, plot_height=600):
     }
 
     # Data cleaning and preparation
-    df_plot = df.copy()
-    df_plot['Product'] = df_plot['Product'].astype(str).str.strip()
-    df_plot['pricingdate'] = pd.to_datetime(df_plot['pricingdate'], format='%m/%d/%Y', errors='coerce')
+    df_plot = df.assign(
+        Product=df['Product'].astype(str).str.strip(),
+        pricingdate=pd.to_datetime(df['pricingdate'], format='%m/%d/%Y', errors='coerce'),
+    )
 
     # Group by pricingdate and Product, then sum 'Validated Value Projected CV'
     product_sum_df = df_plot.groupby(['pricingdate', 'Product'])['Validated Value Projected CV'].sum().unstack(fill_value=0)
@@ -232,30 +382,28 @@ def generate_product_sum_plot(df, fig_width=1800, plot_height=600):
         if product == 'Total': # Skip the total for now, add it last so it's on top or styled differently if needed
             continue
         prod_color = color_map.get(product.lower(), 'grey') # Default color if not in map
-        fig.add_trace(go.Scatter(
+        fig.add_trace(go.Scattergl(
             x=product_sum_df.index,
-            y=product_sum_df[product],
+            y=product_sum_df[product].to_numpy(),
             mode='lines',
             name=product,
             line=dict(color=prod_color, width=2)
         ))
 
     # Add trace for the aggregated sum
-    fig.add_trace(go.Scatter(
+    fig.add_trace(go.Scattergl(
         x=product_sum_df.index,
-        y=product_sum_df['Total'],
+        y=product_sum_df['Total'].to_numpy(),
         mode='lines',
         name='Total (All Products)',
         line=dict(color=color_map['Total'], width=3, dash='dash') # Thicker, dashed line for total
     ))
 
-    # Add vertical lines for auction dates
-    auction_dates = df_plot[df_plot['Is Auction Date'] == 1]['pricingdate'].unique()
-    for auction_date in auction_dates:
-        fig.add_vline(
-            x=auction_date,
-            line=dict(color='lightgrey', width=1)
-        )
+    # Add full-height vertical lines for auction dates
+    is_auction = (df_plot['Is Auction Date'] == 1).to_numpy(dtype=bool, na_value=False)
+    auction_dates = pd.unique(df_plot['pricingdate'].to_numpy()[is_auction])
+    if len(auction_dates):
+        _add_auction_lines(fig, auction_dates, name='Auction Date')
 
     # Update layout
     fig.update_layout(
@@ -293,7 +441,7 @@ def update_index_html(plot_info_list, index_path="output/index.html", output_plo
         print(f"Error reading {index_path}: {e}")
         return
 
-    generated_html_for_insertion = ""
+    plot_cards = []
     for plot in plot_info_list:
         plot_html = (
             f"            <div class=\"metric-card\">\n"
@@ -302,7 +450,8 @@ def update_index_html(plot_info_list, index_path="output/index.html", output_plo
             f"                <a href=\"{output_plot_dir}/{plot['filename']}\" target=\"_blank\" aria-label=\"View {plot['name']}\"></a>\n"
             f"            </div>\n"
         )
-        generated_html_for_insertion += plot_html
+        plot_cards.append(plot_html)
+    generated_html_for_insertion = "".join(plot_cards)
     
     if not generated_html_for_insertion:
         print("No plot information provided to update index.html.")
@@ -369,7 +518,7 @@ if __name__ == "__main__":
 
     # Load data (ensure this path is correct relative to script execution location)
     try:
-        df_sample = pd.read_csv("input/updated_IR_Delta.csv")
+        df_sample = load_data("input/updated_IR_Delta.csv")
     except FileNotFoundError:
         print("Error: input/updated_IR_Delta.csv not found. Make sure the path is correct.")
         exit() # Exit if data file is not found
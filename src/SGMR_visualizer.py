@@ -1,13 +1,80 @@
 import pandas as pd
+import numpy as np
 import plotly.graph_objects as go
-from plotly.subplots import make_subplots
+import plotly.io as pio
 import re
+import warnings
 from typing import Dict, List, Optional, Union, Tuple, Set
 from datetime import datetime
 # Import the rules
-from src.special_metrics_rules import special_metric_rules
+from src.special_metrics_rules import compiled_metric_rules
+from src.utils import lttb_downsample, write_figure_html
 import logging
 
+# Months per maturity unit, used to order sub-metrics by tenor
+_UNIT_MULT = {'Y': 12.0, 'M': 1.0, 'W': 0.25, 'D': 1 / 30}
+
+# Common maturity patterns like 3M, 1Y, 2Y, etc.
+_MATURITY_RE = re.compile(r'(\d+[DWMY])')
+# Match patterns like [USD], [EUR], [JPY]
+_CURRENCY_RE = re.compile(r'\[([A-Z]{3})\]')
+
+
+# Precompiled (include, exclude) patterns per mother metric (None where a rule has no
+# such pattern)
+_COMPILED_RULES: Dict[str, Tuple[Optional[re.Pattern], Optional[re.Pattern]]] = {
+    mother_metric: (rules.get("include_pattern"), rules.get("exclude_pattern"))
+    for mother_metric, rules in compiled_metric_rules.items()
+}
+
+
+def _compiled_rules(mother_metric: str) -> Tuple[Optional[re.Pattern], Optional[re.Pattern]]:
+    """Return the compiled include/exclude patterns for mother_metric."""
+    return _COMPILED_RULES.get(mother_metric, (None, None))
+
+
+def _str_contains(names: pd.Index, pattern: re.Pattern) -> np.ndarray:
+    """Vectorized pattern.search over names, as a boolean array."""
+    with warnings.catch_warnings():
+        # The rule patterns use groups for readability only
+        warnings.filterwarnings('ignore', message='This pattern is interpreted as a regular expression')
+        return np.asarray(names.str.contains(pattern, na=False), dtype=bool)
+
+# Output extensions written as static images (requires kaleido) instead of HTML
+_IMAGE_EXTENSIONS = ('.png', '.svg', '.pdf')
+
+
+def _write_figure(fig: Union[go.Figure, dict], output_file: str, validate: bool = True) -> None:
+    """Write fig as a static image or as HTML loading plotly.js from the CDN, based on the extension."""
+    if output_file.lower().endswith(_IMAGE_EXTENSIONS):
+        pio.write_image(fig, output_file, validate=validate)
+    else:
+        # Referencing the CDN avoids embedding ~3MB of plotly.js in every file
+        write_figure_html(fig, output_file, validate=validate)
+
+
+def _finish_figure(fig_dict: dict, output_file: Optional[str], render: bool) -> Union[go.Figure, dict]:
+    """
+    Wrap fig_dict in a go.Figure, or keep the plain dict when render is False, and write it
+    to output_file if one is given.
+    """
+    if render:
+        fig = go.Figure(fig_dict, skip_invalid=True)
+        if output_file:
+            _write_figure(fig, output_file)
+        return fig
+
+    # Plain dicts bypass validation, so a named template has to be resolved here
+    layout = fig_dict['layout']
+    if isinstance(layout.get('template'), str):
+        layout['template'] = pio.templates[layout['template']].to_plotly_json()
+    if output_file:
+        _write_figure(fig_dict, output_file, validate=False)
+    return fig_dict
+
+# Longer time series are LTTB-downsampled to this many points per trace
+_MAX_TS_POINTS = 2000
+
 class DataVisualizer:
     def __init__(self, data: pd.DataFrame):
         """
@@ -17,43 +84,129 @@ class DataVisualizer:
             data (pd.DataFrame): Input DataFrame with the required columns
         """
         self.data = data.copy()
-            
-    def _extract_maturity(self, metric_name: str) -> Optional[str]:
-        """Extract maturity from metric name if present."""
-        # Common maturity patterns like 3M, 1Y, 2Y, etc.
-        maturity_pattern = r'(\d+[DWMY])'
-        match = re.search(maturity_pattern, metric_name)
-        return match.group(1) if match else None
-        
-    def _extract_currency(self, metric_name: str) -> Optional[str]:
-        """Extract currency from metric name if present."""
-        # Match patterns like [USD], [EUR], [JPY]
-        currency_pattern = r'\[([A-Z]{3})\]'
-        match = re.search(currency_pattern, metric_name)
-        return match.group(1) if match else None
-    
-    def _convert_maturity_to_months(self, maturity: str) -> float:
-        """Convert maturity string to months for sorting."""
-        if not maturity:
-            return float('inf')
-        
-        value = int(maturity[:-1])
-        unit = maturity[-1]
-        
-        if unit == 'Y':
-            return value * 12
-        elif unit == 'M':
-            return value
-        elif unit == 'W':
-            return value / 4
-        elif unit == 'D':
-            return value / 30
-        return float('inf')
-    
+
+        # Low-cardinality name columns are filtered and uniqued on every plot;
+        # categorical codes make those comparisons integer-based.
+        for col in ('stranaNodeName', 'rmRiskMetricName', 'consoMreMetricName'):
+            self.data[col] = self.data[col].astype('category')
+
+        # Date filters compare int64 keys in the column's own datetime unit
+        self.data['consoValueDate'] = pd.to_datetime(self.data['consoValueDate'])
+        self._date_unit = np.datetime_data(self.data['consoValueDate'].dtype)[0]
+
+        # Sort once by (node, metric, date) (stable), so each metric's rows form one
+        # contiguous, date-ordered block as required by the time series traces.
+        self.data = self.data.sort_values(
+            ['stranaNodeName', 'consoMreMetricName', 'consoValueDate'], kind='mergesort'
+        ).reset_index(drop=True)
+
+        # Row slice per (stranaNodeName, consoMreMetricName), so plots select their
+        # rows by dict lookup instead of scanning the whole table
+        self._metric_slices: Dict[Tuple[str, str], slice] = {}
+        # Row slice per stranaNodeName; node rows are contiguous as well
+        self._node_slices: Dict[str, slice] = {}
+        # Category codes are the integer group keys; -1 marks a missing name
+        node_codes = self.data['stranaNodeName'].cat.codes.to_numpy()
+        metric_codes = self.data['consoMreMetricName'].cat.codes.to_numpy()
+        node_names = self.data['stranaNodeName'].cat.categories
+        metric_names = self.data['consoMreMetricName'].cat.categories
+        if len(self.data):
+            boundaries = np.flatnonzero((np.diff(node_codes) != 0) | (np.diff(metric_codes) != 0)) + 1
+            starts = np.r_[0, boundaries]
+            stops = np.r_[boundaries, len(self.data)]
+            for start, stop in zip(starts, stops):
+                node_code, metric_code = node_codes[start], metric_codes[start]
+                if node_code >= 0 and metric_code >= 0: # Skip missing names
+                    self._metric_slices[(node_names[node_code], metric_names[metric_code])] = slice(int(start), int(stop))
+
+            node_starts = np.r_[0, np.flatnonzero(np.diff(node_codes) != 0) + 1]
+            node_stops = np.r_[node_starts[1:], len(self.data)]
+            for start, stop in zip(node_starts, node_stops):
+                if node_codes[start] >= 0:
+                    self._node_slices[node_names[node_codes[start]]] = slice(int(start), int(stop))
+
+        # The plot methods only read these columns, so they work on the raw arrays
+        # instead of materializing filtered DataFrames.
+        self._dates = self.data['consoValueDate'].to_numpy()
+        self._metric_names = self.data['consoMreMetricName'].to_numpy(dtype=object)
+        self._values = self.data['consoValue'].to_numpy(dtype=np.float64)
+        self._lim_max = self.data['limMaxValue'].to_numpy(dtype=np.float64)
+        self._lim_min = self.data['limMinValue'].to_numpy(dtype=np.float64)
+
+        # Latest date per (strana_node, related metrics) selection, filled lazily.
+        # self.data is not mutated after init, so cached values stay valid.
+        self._latest_date_cache: Dict[Tuple[str, Tuple[str, ...]], datetime] = {}
+
+        # Sorted related metrics per (strana_node, mother_metric), filled lazily
+        self._related_cache: Dict[Tuple[str, str], List[str]] = {}
+
+    def _select(self, strana_node: str, metrics: List[str]) -> np.ndarray:
+        """Row positions for strana_node whose consoMreMetricName is one of metrics, grouped by metric."""
+        slices = [self._metric_slices[(strana_node, m)] for m in metrics if (strana_node, m) in self._metric_slices]
+        if not slices:
+            return np.empty(0, dtype=np.intp)
+        return np.r_[tuple(slices)]
+
+    def _date_keys(self, dates) -> np.ndarray:
+        """Return int64 keys of a date or list of dates, comparable with _date_values."""
+        return np.array(dates, dtype=f'datetime64[{self._date_unit}]').view('i8')
+
+    def _date_values(self, rows: np.ndarray) -> np.ndarray:
+        """Return consoValueDate at the given row positions as int64 keys."""
+        return self._dates[rows].view('i8')
+
+    def _bar_values(self, rows: np.ndarray, metrics: List[str]) -> Tuple[List[Optional[float]], List[str]]:
+        """
+        Align the values at the given rows to metrics, for one bar trace.
+
+        Returns:
+            Tuple of (y values with None for missing metrics, labels formatted to two decimals)
+        """
+        value_map = dict(zip(self._metric_names[rows], self._values[rows]))
+        y = np.fromiter((value_map.get(m, np.nan) for m in metrics), dtype=np.float64, count=len(metrics))
+        has_value = ~np.isnan(y)
+        text_values = np.where(has_value, np.char.mod('%.2f', y), '').tolist()
+        return np.where(has_value, y, None).tolist(), text_values
+
+    def _get_latest_date(self, strana_node: str, metrics: List[str], rows: np.ndarray) -> datetime:
+        """Return the latest consoValueDate of the given rows, cached per (strana_node, metrics)."""
+        key = (strana_node, tuple(metrics))
+        if key not in self._latest_date_cache:
+            self._latest_date_cache[key] = pd.Timestamp(self._dates[rows].max()) if rows.size else pd.NaT
+        return self._latest_date_cache[key]
+
+    @staticmethod
+    def _maturities_to_months(maturity: pd.Series) -> np.ndarray:
+        """Maturities (e.g. '3M', '1Y') as months for sorting; inf where the maturity is missing."""
+        maturity = maturity.where(maturity.str.fullmatch(_MATURITY_RE, na=False))
+        months = pd.to_numeric(maturity.str[:-1]) * maturity.str[-1].map(_UNIT_MULT)
+        return months.fillna(np.inf).to_numpy(dtype=np.float64)
+
+    def _classify_metrics(self, names) -> Tuple[np.ndarray, pd.Series, pd.Series]:
+        """
+        Extract maturity and currency for many metric names in one vectorized pass.
+
+        Args:
+            names: Array-like of metric names
+
+        Returns:
+            Tuple[np.ndarray, pd.Series, pd.Series]: Mother-metric mask (no maturity and
+            no currency), and the maturity and currency per name (NaN where absent)
+        """
+        names = pd.Series(names, dtype=object)
+        maturity = names.str.extract(_MATURITY_RE, expand=False)
+        currency = names.str.extract(_CURRENCY_RE, expand=False)
+        is_mother = (maturity.isna() & currency.isna()).to_numpy()
+        return is_mother, maturity, currency
+
     def get_available_strana_nodes(self) -> List[str]:
         """Return list of available stranaNodeName values."""
         return sorted(self.data['stranaNodeName'].unique())
     
+    def _node_metrics(self, strana_node: str):
+        """Return the unique rmRiskMetricName values of a stranaNode."""
+        return self.data['rmRiskMetricName'].iloc[self._node_slices.get(strana_node, slice(0, 0))].unique()
+
     def get_mother_metrics(self, strana_node: str) -> List[str]:
         """
         Get list of mother metrics (metrics without maturity/currency specifications).
@@ -64,17 +217,13 @@ class DataVisualizer:
         Returns:
             List[str]: List of mother metrics
         """
-        all_metrics = self.data[self.data['stranaNodeName'] == strana_node]['rmRiskMetricName'].unique()
-        mother_metrics = []
-        
-        for metric in all_metrics:
-            # If metric has no maturity and no currency, it's a mother metric
-            if not self._extract_maturity(metric) and not self._extract_currency(metric):
-                mother_metrics.append(metric)
-        
-        return sorted(mother_metrics)
+        all_metrics = pd.Series(self._node_metrics(strana_node), dtype=object)
+        # A metric with no maturity and no currency is a mother metric
+        is_mother, _, _ = self._classify_metrics(all_metrics)
+
+        return sorted(all_metrics[is_mother])
     
-    def get_all_related_metrics(self, strana_node: str, mother_metric: str) -> List[str]:
+    def get_all_related_metrics(self, strana_node: str, mother_metric: str, all_metrics=None) -> List[str]:
         """
         Get all metrics related to a mother metric, including sub-metrics with maturity/currency.
         Case-insensitive matching is used to find related metrics.
@@ -83,62 +232,65 @@ class DataVisualizer:
         Args:
             strana_node (str): The stranaNodeName
             mother_metric (str): The mother metric name
+            all_metrics (optional): Precomputed unique metric names of strana_node, so
+                callers looping over mother metrics look them up only once
             
         Returns:
             List[str]: List of all related metrics, sorted by maturity/currency
         """
+        cache_key = (strana_node, mother_metric)
+        cached = self._related_cache.get(cache_key)
+        if cached is not None:
+            return list(cached)
+
         # Get all metrics for this stranaNode
-        all_metrics = self.data[self.data['stranaNodeName'] == strana_node]['rmRiskMetricName'].unique()
+        if all_metrics is None:
+            all_metrics = self._node_metrics(strana_node)
         
-        related_metrics: List[str] = []
-
-        if mother_metric in special_metric_rules:
-            rules = special_metric_rules[mother_metric]
-            include_pattern = rules.get("include_pattern")
-            exclude_pattern = rules.get("exclude_pattern")
+        mother_lower = mother_metric.lower()
+        inc, exc = _compiled_rules(mother_metric)
+        names = pd.Index(all_metrics, dtype=object)
 
-            if include_pattern:
-                # If include_pattern is specified, it defines the set directly from all_metrics.
-                # This allows patterns to include metrics that don't necessarily contain the mother_metric string itself (e.g., STTHH for VaR).
-                related_metrics = [m for m in all_metrics if re.search(include_pattern, m, re.IGNORECASE)]
-                
-                # Then, apply exclude_pattern to this specifically selected set
-                if exclude_pattern:
-                    related_metrics = [m for m in related_metrics if not re.search(exclude_pattern, m, re.IGNORECASE)]
-            else:
-                # No include_pattern, but other rules (like exclude_pattern only) might exist.
-                # Default to finding metrics that contain the mother_metric string (case-insensitive).
-                related_metrics = [m for m in all_metrics if mother_metric.lower() in m.lower()]
-                if exclude_pattern: # Apply exclude_pattern if it exists without an include_pattern
-                    related_metrics = [m for m in related_metrics if not re.search(exclude_pattern, m, re.IGNORECASE)]
+        if inc is not None:
+            # If include_pattern is specified, it defines the set directly from all_metrics.
+            # This allows patterns to include metrics that don't necessarily contain the mother_metric string itself (e.g., STTHH for VaR).
+            mask = _str_contains(names, inc)
         else:
-            # No special rules at all for this mother_metric.
             # Default to finding metrics that contain the mother_metric string (case-insensitive).
-            related_metrics = [m for m in all_metrics if mother_metric.lower() in m.lower()]
-
-        # Sort metrics by maturity/currency
-        def sort_key(metric):
-            maturity = self._extract_maturity(metric)
-            currency = self._extract_currency(metric)
-            
+            mask = np.asarray(names.str.contains(re.escape(mother_metric), case=False, regex=True, na=False), dtype=bool)
+        if exc is not None:
+            mask &= ~_str_contains(names, exc)
+
+        related_metrics: List[str] = names[mask].tolist()
+
+        # Sort metrics by maturity/currency, with all sort keys computed in one vectorized pass
+        _, maturity, currency = self._classify_metrics(related_metrics)
+        months = self._maturities_to_months(maturity)
+        sort_keys = {}
+        for metric, has_maturity, metric_currency, metric_months in zip(
+            related_metrics, maturity.notna(), currency, months
+        ):
             # Put exact matches (ignoring case) of the mother_metric first
-            if metric.lower() == mother_metric.lower():
-                return (0, '')
-            elif maturity:  # Then sort by maturity
-                return (1, self._convert_maturity_to_months(maturity))
-            elif currency:  # Then by currency
-                return (2, currency)
-            return (3, metric)  # Other cases (alphabetical for metrics without specific components or after primary sorting)
-        
-        return sorted(related_metrics, key=sort_key)
+            if metric.lower() == mother_lower:
+                sort_keys[metric] = (0, '')
+            elif has_maturity:  # Then sort by maturity
+                sort_keys[metric] = (1, metric_months)
+            elif pd.notna(metric_currency):  # Then by currency
+                sort_keys[metric] = (2, metric_currency)
+            else:  # Other cases (alphabetical for metrics without specific components or after primary sorting)
+                sort_keys[metric] = (3, metric)
+        
+        self._related_cache[cache_key] = sorted(related_metrics, key=sort_keys.__getitem__)
+        return list(self._related_cache[cache_key])
     
     def create_bar_plot(
         self,
         strana_node: str,
         mother_metric: str,
         date: Optional[datetime] = None,
-        output_file: Optional[str] = None
-    ) -> go.Figure:
+        output_file: Optional[str] = None,
+        render: bool = True
+    ) -> Union[go.Figure, dict]:
         """
         Create a bar plot for all metrics related to the mother metric.
         
@@ -147,56 +299,55 @@ class DataVisualizer:
             mother_metric (str): The mother metric name
             date (datetime, optional): Specific date to plot, defaults to latest
             output_file (str, optional): If provided, save the plot to this file
+                (.png/.svg/.pdf are written as static images, anything else as HTML)
+            render (bool, optional): If False, skip go.Figure construction and validation and
+                return the plain {'data': ..., 'layout': ...} dict (e.g. for Dash's figure prop)
         """
         # Get all related metrics
         metrics = self.get_all_related_metrics(strana_node, mother_metric)
         
         # Filter data for all metrics
-        mask = (self.data['stranaNodeName'] == strana_node) & \
-               (self.data['consoMreMetricName'].isin(metrics))
-        plot_data = self.data[mask].copy()
+        rows = self._select(strana_node, metrics)
         
         # Use latest date if not specified
         if date is None:
-            date = plot_data['consoValueDate'].max()
+            date = self._get_latest_date(strana_node, metrics, rows)
         
         # Filter for specific date
-        plot_data = plot_data[plot_data['consoValueDate'] == date]
+        rows = rows[self._date_values(rows) == self._date_keys(date)]
         
-        # Create bar plot
-        fig = go.Figure()
-        
-        # Add bars
-        fig.add_trace(go.Bar(
+        # Align values to the pre-sorted metrics list once; reused for bars and labels
+        y_values, text_values = self._bar_values(rows, metrics)
+
+        # Bar trace as a plain dict; the figure is built once below
+        trace = dict(
+            type='bar',
             x=metrics,  # Use pre-sorted metrics list
-            y=plot_data.set_index('consoMreMetricName').reindex(metrics)['consoValue'],
-            text=plot_data.set_index('consoMreMetricName').reindex(metrics)['consoValue'].round(2),
+            y=y_values,
+            text=text_values,
             textposition='auto',
-        ))
+        )
         
         # Fixed height and width
         fixed_height = 1000
         fixed_width = 1800
         
-        # Update layout
-        fig.update_layout(
-            title=f"{strana_node} - {mother_metric} and Related Metrics ({date.strftime('%Y-%m-%d')})",
-            xaxis_title="Metric",
-            yaxis_title="Value",
+        layout = dict(
+            title=dict(text=f"{strana_node} - {mother_metric} and Related Metrics ({date.strftime('%Y-%m-%d')})"),
+            xaxis=dict(
+                title=dict(text="Metric"),
+                tickangle=-45, # Rotated labels to prevent overlap
+                automargin=True # Allow x-axis to use more margin if needed for labels
+            ),
+            yaxis=dict(title=dict(text="Value"), automargin=True),
             showlegend=False,
             template="plotly_white",
-            xaxis_tickangle=-45, # Rotated labels to prevent overlap
             height=fixed_height,
             width=fixed_width,
-            margin=dict(t=100, b=150, l=70, r=70),  # Adjusted margins, esp. bottom for rotated labels
-            xaxis_automargin=True, # Allow x-axis to use more margin if needed for labels
-            yaxis_automargin=True
+            margin=dict(t=100, b=150, l=70, r=70)  # Adjusted margins, esp. bottom for rotated labels
         )
         
-        if output_file:
-            fig.write_html(output_file)
-        
-        return fig
+        return _finish_figure({'data': [trace], 'layout': layout}, output_file, render)
 
     def _prepare_time_series_layout_config(self, num_metrics: int) -> dict:
         """
@@ -231,74 +382,125 @@ class DataVisualizer:
 
         return {'num_rows': num_rows, 'vertical_spacing': vertical_spacing, 'height': fixed_height, 'width': fixed_width}
 
-    def _add_time_series_subplot_elements(
+    @staticmethod
+    def _subplot_axis_refs(row: int, col: int) -> Tuple[str, str]:
+        """Return the (x, y) axis references of a cell in the 2-column subplot grid."""
+        axis_idx = (row - 1) * 2 + col
+        suffix = '' if axis_idx == 1 else str(axis_idx)
+        return f'x{suffix}', f'y{suffix}'
+
+    @staticmethod
+    def _subplot_axis_keys(row: int, col: int) -> Tuple[str, str]:
+        """Return the (xaxis, yaxis) layout keys of a cell in the 2-column subplot grid."""
+        axis_idx = (row - 1) * 2 + col
+        suffix = '' if axis_idx == 1 else str(axis_idx)
+        return f'xaxis{suffix}', f'yaxis{suffix}'
+
+    def _build_time_series_subplot_elements(
         self,
-        fig: go.Figure,
-        metric_data: pd.DataFrame,
+        x_values: np.ndarray,
+        y_values: np.ndarray,
         metric_name: str,
         row: int,
         col: int,
-        event_dates: Optional[List[datetime]]
-    ):
+        latest_limits: Optional[Tuple[float, float]] = None
+    ) -> Tuple[dict, List[dict], List[dict]]:
         """
-        Add traces, limit lines, event lines, and configure axes for a single subplot.
-        Assumes metric_data is already sorted by 'consoValueDate'.
+        Build the trace, limit line shapes and limit annotations for a single subplot.
+        Assumes x_values (dates) are already sorted.
+        latest_limits holds (limMaxValue, limMinValue) of the metric's latest row, if any.
+
+        Returns:
+            Tuple of (trace, limit shapes, limit annotations), all as plain dicts so the
+            figure can be built in a single step.
         """
-        # Add the time series trace
-        fig.add_trace(
-            go.Scatter(
-                x=metric_data['consoValueDate'],
-                y=metric_data['consoValue'],
-                name=metric_name, # Used for hover text, legend is off
-                mode='lines+markers',
-                showlegend=False
-            ),
-            row=row,
-            col=col
+        xref, yref = self._subplot_axis_refs(row, col)
+        if len(x_values) > _MAX_TS_POINTS:
+            # Keep the visually significant points only; the browser cannot resolve more
+            keep = lttb_downsample(x_values.view('i8'), y_values, _MAX_TS_POINTS)
+            x_values, y_values = x_values[keep], y_values[keep]
+
+        trace = dict(
+            type='scatter',
+            x=x_values,
+            y=y_values,
+            name=metric_name, # Used for hover text, legend is off
+            mode='lines+markers',
+            showlegend=False,
+            xaxis=xref,
+            yaxis=yref
         )
 
+        shapes: List[dict] = []
+        annotations: List[dict] = []
+
         # Add limit lines if they exist for this specific metric
-        if not metric_data.empty:
-            latest_data = metric_data.iloc[-1]
-            if pd.notna(latest_data['limMaxValue']):
-                fig.add_hline(
-                    y=latest_data['limMaxValue'],
-                    line_dash="dash",
-                    line_color="red",
-                    annotation=dict(text="Max Limit", xanchor='left', x=0, yanchor='bottom'),
-                    row=row,
-                    col=col
-                )
-            if pd.notna(latest_data['limMinValue']):
-                fig.add_hline(
-                    y=latest_data['limMinValue'],
-                    line_dash="dash",
-                    line_color="red",
-                    annotation=dict(text="Min Limit", xanchor='left', x=0, yanchor='top'),
-                    row=row,
-                    col=col
-                )
-
-        # Add event date lines if specified
-        if event_dates:
-            for event_date in event_dates:
-                if isinstance(event_date, datetime): # Ensure it's a datetime object
-                    fig.add_vline(
-                        x=event_date.timestamp() * 1000, # Convert datetime to milliseconds
-                        line_width=1,
-                        line_dash="dot",
-                        line_color="darkgrey",
-                        row=row,
-                        col=col
-                    )
-        
-        # Configure axes for this subplot
-        fig.update_xaxes(title_text="", row=row, col=col)
-        fig.update_yaxes(title_text="Value", row=row, col=col)
+        if latest_limits is not None:
+            for limit_value, label, yanchor in zip(latest_limits, ('Max Limit', 'Min Limit'), ('bottom', 'top')):
+                if not np.isnan(limit_value):
+                    shapes.append(dict(
+                        type='line', xref=f'{xref} domain', yref=yref,
+                        x0=0, x1=1, y0=limit_value, y1=limit_value,
+                        line=dict(color='red', dash='dash')
+                    ))
+                    annotations.append(dict(
+                        text=label, xref=f'{xref} domain', yref=yref,
+                        x=0, y=limit_value, xanchor='left', yanchor=yanchor,
+                        showarrow=False
+                    ))
+
+        return trace, shapes, annotations
+
+    def _build_event_line_shapes(
+        self,
+        row: int,
+        col: int,
+        event_positions: List[float]
+    ) -> List[dict]:
+        """Build vertical event date line shapes spanning a subplot, at x positions in milliseconds."""
+        xref, yref = self._subplot_axis_refs(row, col)
+        return [
+            dict(
+                type='line', xref=xref, yref=f'{yref} domain',
+                x0=x, x1=x, y0=0, y1=1,
+                line=dict(color='darkgrey', dash='dot', width=1)
+            )
+            for x in event_positions
+        ]
+
+    def _subplot_grid_layout(
+        self,
+        num_rows: int,
+        vertical_spacing: float,
+        horizontal_spacing: float
+    ) -> dict:
+        """
+        Compute the axes of a num_rows x 2 subplot grid analytically, with the same
+        domains make_subplots would produce (row 1 on top).
+
+        Returns:
+            dict: Layout with an anchored xaxis/yaxis entry per cell
+        """
+        col_width = (1.0 - horizontal_spacing) / 2
+        heights = [(1.0 - vertical_spacing * (num_rows - 1)) / num_rows] * num_rows
+
+        layout = {}
+        for row in range(1, num_rows + 1):
+            # Rows are stacked from the bottom, so row 1 starts highest
+            below = num_rows - row
+            y_start = sum(heights[:below]) + below * vertical_spacing
+            y_domain = [min(max(y, 0.0), 1.0) for y in (y_start, y_start + heights[below])]
+            for col in (1, 2):
+                x_start = (col - 1) * (col_width + horizontal_spacing)
+                xref, yref = self._subplot_axis_refs(row, col)
+                xaxis_key, yaxis_key = self._subplot_axis_keys(row, col)
+                layout[xaxis_key] = dict(anchor=yref, domain=[x_start, x_start + col_width])
+                layout[yaxis_key] = dict(anchor=xref, domain=y_domain)
+        return layout
 
     def _generate_subplot_title_annotation(
         self,
-        fig: go.Figure, # Needed for get_subplot domain
+        layout: dict, # Needed for the subplot domains
         metric_name: str,
         row: int,
         col: int,
@@ -307,7 +509,8 @@ class DataVisualizer:
         """
         Generate the annotation dictionary for a subplot title.
         """
-        x_domain, y_domain = fig.get_subplot(row=row, col=col).xaxis.domain, fig.get_subplot(row=row, col=col).yaxis.domain
+        xaxis_key, yaxis_key = self._subplot_axis_keys(row, col)
+        x_domain, y_domain = layout[xaxis_key]['domain'], layout[yaxis_key]['domain']
         x_pos = (x_domain[0] + x_domain[1]) / 2
         y_pos = y_domain[1] + 0.02 # Adjust offset as needed
 
@@ -329,8 +532,9 @@ class DataVisualizer:
         strana_node: str,
         mother_metric: str,
         output_file: Optional[str] = None,
-        event_dates: Optional[List[datetime]] = None  # New parameter for event dates
-    ) -> go.Figure:
+        event_dates: Optional[List[datetime]] = None,  # New parameter for event dates
+        render: bool = True
+    ) -> Union[go.Figure, dict]:
         """
         Create a time series plot with subplots for all metrics related to the mother metric.
         Each subplot will have independent axes and its own limit lines if available.
@@ -341,92 +545,110 @@ class DataVisualizer:
             strana_node (str): The stranaNodeName to plot
             mother_metric (str): The mother metric name
             output_file (str, optional): If provided, save the plot to this file
+                (.png/.svg/.pdf are written as static images, anything else as HTML)
             event_dates (Optional[List[datetime]], optional): A list of dates to mark with vertical lines.
+            render (bool, optional): If False, skip go.Figure construction and validation and
+                return the plain {'data': ..., 'layout': ...} dict (e.g. for Dash's figure prop)
         """
         # Get all related metrics
         metrics = self.get_all_related_metrics(strana_node, mother_metric)
 
         if not metrics:
             logging.warning(f"No metrics found for mother_metric '{mother_metric}' in stranaNode '{strana_node}'. Skipping time series plot generation.")
-            fig = go.Figure()
-            fig.update_layout(
-                title=f"{strana_node} - {mother_metric} - No Metrics Found",
+            layout = dict(
+                title=dict(text=f"{strana_node} - {mother_metric} - No Metrics Found"),
                 height=1000, # Fixed height
                 width=1800  # Fixed width
             )
-            if output_file:
-                fig.write_html(output_file)
-            return fig
+            return _finish_figure({'data': [], 'layout': layout}, output_file, render)
         
-        # Filter data ONCE for all relevant metrics and sort by date.
-        mask = (self.data['stranaNodeName'] == strana_node) & \
-               (self.data['consoMreMetricName'].isin(metrics))
-        # .copy() ensures we operate on a distinct DataFrame for this plot.
-        relevant_plot_data = self.data[mask].copy()
-        relevant_plot_data.sort_values('consoValueDate', inplace=True)
+        # Each metric's rows are a contiguous, date-ordered slice of self.data
+        metric_slices = {
+            m: self._metric_slices[(strana_node, m)] for m in metrics if (strana_node, m) in self._metric_slices
+        }
 
         # Calculate layout parameters using fixed height and width
         layout_config = self._prepare_time_series_layout_config(len(metrics))
         
-        # Create figure with subplots
-        fig = make_subplots(
-            rows=layout_config['num_rows'],
-            cols=2, # Fixed at 2 columns
-            vertical_spacing=layout_config['vertical_spacing'],
-            horizontal_spacing=0.1, # Reduced horizontal spacing slightly
-            shared_xaxes=False     # Independent x-axes
+        # Subplot axes (independent, 2 columns) are computed directly; traces and layout
+        # are assembled as plain dicts and the figure is built once at the end.
+        layout = self._subplot_grid_layout(
+            layout_config['num_rows'],
+            layout_config['vertical_spacing'],
+            horizontal_spacing=0.1 # Reduced horizontal spacing slightly
         )
         
+        # Event dates are converted once and de-duplicated (keeping their order). Subplots
+        # have independent x-axes, so each one still needs its own copy of the lines.
+        event_positions = pd.unique(np.array([
+            event_date.timestamp() * 1000 # Convert datetime to milliseconds
+            for event_date in (event_dates or [])
+            if isinstance(event_date, datetime) # Ensure it's a datetime object
+        ], dtype=np.float64)).tolist()
+
         subplot_title_annotations = [] # Initialize list for annotations
+        traces: List[dict] = []
+        event_shapes: List[dict] = []
+        limit_shapes: List[dict] = []
+        limit_annotations: List[dict] = []
 
-        # Add time series for each metric in separate subplots
+        # Build time series for each metric in separate subplots
         for idx, current_metric_name in enumerate(metrics, 1):
             # Calculate row and column (1-based indexing)
             row = (idx + 1) // 2
             col = 2 if idx % 2 == 0 else 1
             
-            metric_data_subset = relevant_plot_data[relevant_plot_data['consoMreMetricName'] == current_metric_name]
-            
-            has_data = not metric_data_subset.empty
-
-            self._add_time_series_subplot_elements(
-                fig, metric_data_subset, current_metric_name, row, col, event_dates
+            has_data = current_metric_name in metric_slices
+            sl = metric_slices[current_metric_name] if has_data else slice(0, 0)
+            # Limits of the metric's latest row, i.e. the last row of its slice. NaN limits
+            # are kept as they are rather than falling back to an older non-null value.
+            latest_limits = (self._lim_max[sl.stop - 1], self._lim_min[sl.stop - 1]) if has_data else None
+
+            trace, shapes, annotations = self._build_time_series_subplot_elements(
+                self._dates[sl], self._values[sl], current_metric_name, row, col, latest_limits
             )
+            traces.append(trace)
+            limit_shapes.extend(shapes)
+            limit_annotations.extend(annotations)
+            if has_data: # Lines on an empty subplot would only stretch its axis
+                event_shapes.extend(self._build_event_line_shapes(row, col, event_positions))
+
+            # Configure axes for this subplot
+            xaxis_key, yaxis_key = self._subplot_axis_keys(row, col)
+            layout[xaxis_key]['title'] = dict(text="")
+            layout[yaxis_key]['title'] = dict(text="Value")
             
             annotation = self._generate_subplot_title_annotation(
-                fig, current_metric_name, row, col, has_data
+                layout, current_metric_name, row, col, has_data
             )
             subplot_title_annotations.append(annotation)
-        
-        # Update overall figure layout
-        fig.update_layout(
-            title=f"{strana_node} - {mother_metric} and Related Metrics Time Series",
+
+        # Ensure axes within subplots use automargin for labels
+        for key, axis in layout.items():
+            if key.startswith(('xaxis', 'yaxis')):
+                axis['automargin'] = True
+
+        layout.update(
+            title=dict(text=f"{strana_node} - {mother_metric} and Related Metrics Time Series"),
             height=layout_config['height'], # This will be 1000
             width=layout_config['width'],   # This will be 1800
             showlegend=False,
             template="plotly_white",
-            annotations=subplot_title_annotations,
+            shapes=limit_shapes + event_shapes,
+            annotations=subplot_title_annotations + limit_annotations,
             margin=dict(t=100, b=70, l=70, r=70) # Adjusted margins
         )
-        
-        # Ensure axes within subplots use automargin for labels
-        for i in range(1, layout_config['num_rows'] + 1):
-            for j in range(1, 3): # 2 columns
-                fig.update_xaxes(row=i, col=j, automargin=True)
-                fig.update_yaxes(row=i, col=j, automargin=True)
 
-        if output_file:
-            fig.write_html(output_file)
-        
-        return fig
+        return _finish_figure({'data': traces, 'layout': layout}, output_file, render)
 
     def create_grouped_bar_plots(
         self,
         strana_node: str,
         mother_metrics: List[str],
         selected_dates: Optional[Union[datetime, List[datetime]]] = None,
-        output_file: Optional[str] = None
-    ) -> go.Figure:
+        output_file: Optional[str] = None,
+        render: bool = True
+    ) -> Union[go.Figure, dict]:
         """
         Create grouped bar plots for multiple mother metrics in the same stranaNode.
         Each mother metric and its related metrics will be in a separate subplot.
@@ -440,6 +662,9 @@ class DataVisualizer:
             selected_dates (Optional[Union[datetime, List[datetime]]], optional): 
                 Specific date or list of dates to plot. Defaults to None (latest for each subplot).
             output_file (str, optional): If provided, save the plot to this file
+                (.png/.svg/.pdf are written as static images, anything else as HTML)
+            render (bool, optional): If False, skip go.Figure construction and validation and
+                return the plain {'data': ..., 'layout': ...} dict (e.g. for Dash's figure prop)
         """
         fixed_height = 1000
         fixed_width = 1800
@@ -466,121 +691,118 @@ class DataVisualizer:
                     dates_provided_by_user = True
                 else:
                     logging.warning(f"Empty list of dates provided for {strana_node}. Generating empty plot.")
-                    fig = go.Figure()
-                    fig.update_layout(title=f"{strana_node} - No dates specified for plotting", height=fixed_height, width=fixed_width)
-                    if output_file:
-                        fig.write_html(output_file)
-                    return fig
+                    layout = dict(title=dict(text=f"{strana_node} - No dates specified for plotting"), height=fixed_height, width=fixed_width)
+                    return _finish_figure({'data': [], 'layout': layout}, output_file, render)
             else:
                 logging.error(f"Invalid list contents for selected_dates in create_grouped_bar_plots for {strana_node}. Expected list of datetimes. Generating empty plot.")
-                fig = go.Figure()
-                fig.update_layout(title=f"{strana_node} - Error: Invalid date input format", height=fixed_height, width=fixed_width)
-                if output_file:
-                    fig.write_html(output_file)
-                return fig
+                layout = dict(title=dict(text=f"{strana_node} - Error: Invalid date input format"), height=fixed_height, width=fixed_width)
+                return _finish_figure({'data': [], 'layout': layout}, output_file, render)
         elif selected_dates is not None:
             logging.error(f"Invalid type for selected_dates in create_grouped_bar_plots for {strana_node}. Expected datetime, list of datetimes, or None. Generating empty plot.")
-            fig = go.Figure()
-            fig.update_layout(title=f"{strana_node} - Error: Invalid date input type", height=fixed_height, width=fixed_width)
-            if output_file:
-                fig.write_html(output_file)
-            return fig
+            layout = dict(title=dict(text=f"{strana_node} - Error: Invalid date input type"), height=fixed_height, width=fixed_width)
+            return _finish_figure({'data': [], 'layout': layout}, output_file, render)
         
         if not mother_metrics:
             logging.warning(f"No mother metrics provided for {strana_node}. Generating empty plot.")
-            fig = go.Figure()
-            fig.update_layout(title=f"{strana_node} - No Mother Metrics Specified", height=fixed_height, width=fixed_width)
-            if output_file:
-                fig.write_html(output_file)
-            return fig
-
-        fig = make_subplots(
-            rows=num_rows,
-            cols=2,
-            subplot_titles=[f"{metric}" for metric in mother_metrics],
-            vertical_spacing=vertical_spacing,
-            horizontal_spacing=horizontal_spacing
-        )
-        
+            layout = dict(title=dict(text=f"{strana_node} - No Mother Metrics Specified"), height=fixed_height, width=fixed_width)
+            return _finish_figure({'data': [], 'layout': layout}, output_file, render)
+
+        # Subplot axes and titles are computed directly; traces and layout are
+        # assembled as plain dicts and the figure is built once at the end.
+        layout = self._subplot_grid_layout(num_rows, vertical_spacing, horizontal_spacing)
+        title_annotations = []
+        for idx, mother_metric in enumerate(mother_metrics, 1):
+            xaxis_key, yaxis_key = self._subplot_axis_keys((idx + 1) // 2, 2 if idx % 2 == 0 else 1)
+            x_domain, y_domain = layout[xaxis_key]['domain'], layout[yaxis_key]['domain']
+            title_annotations.append(dict(
+                text=f"{mother_metric}",
+                xref="paper", yref="paper",
+                x=(x_domain[0] + x_domain[1]) / 2, y=y_domain[1],
+                xanchor='center', yanchor='bottom',
+                showarrow=False,
+                font=dict(size=16)
+            ))
+        layout['annotations'] = title_annotations
+        
+        traces: List[dict] = []
         traces_added = False
         dates_already_in_legend = set()
+        # The node's metric names are shared by every mother metric below
+        node_metrics = self._node_metrics(strana_node)
 
         for idx, mother_metric in enumerate(mother_metrics, 1):
             row = (idx + 1) // 2
             col = 2 if idx % 2 == 0 else 1
             
-            metrics = self.get_all_related_metrics(strana_node, mother_metric)
+            metrics = self.get_all_related_metrics(strana_node, mother_metric, node_metrics)
             
-            current_mother_metric_data = self.data[
-                (self.data['stranaNodeName'] == strana_node) &
-                (self.data['consoMreMetricName'].isin(metrics))
-            ]
+            mother_metric_rows = self._select(strana_node, metrics)
 
-            if current_mother_metric_data.empty:
+            if not mother_metric_rows.size:
                 logging.info(f"No data available for mother metric {mother_metric} in {strana_node} before date filtering.")
                 # Update subplot title to indicate no data
-                fig.layout.annotations[idx-1].text = f"{mother_metric}<br>(No Data)"
+                title_annotations[idx-1]['text'] = f"{mother_metric}<br>(No Data)"
                 continue
 
             actual_dates_this_subplot: List[datetime] = []
-            data_for_bars_this_subplot: pd.DataFrame
+            rows_for_bars_this_subplot: np.ndarray
 
             if dates_provided_by_user:
                 actual_dates_this_subplot = dates_for_plot_generation
-                data_for_bars_this_subplot = current_mother_metric_data[current_mother_metric_data['consoValueDate'].isin(actual_dates_this_subplot)]
+                rows_for_bars_this_subplot = mother_metric_rows[np.isin(
+                    self._date_values(mother_metric_rows), self._date_keys(actual_dates_this_subplot)
+                )]
             else: 
-                latest_date_for_subplot = current_mother_metric_data['consoValueDate'].max()
+                latest_date_for_subplot = self._get_latest_date(strana_node, metrics, mother_metric_rows)
                 if pd.isna(latest_date_for_subplot): # Handle case where no dates exist after filtering
                     logging.info(f"No valid latest date for mother metric {mother_metric} in {strana_node}.")
-                    fig.layout.annotations[idx-1].text = f"{mother_metric}<br>(No Data)"
+                    title_annotations[idx-1]['text'] = f"{mother_metric}<br>(No Data)"
                     continue
                 actual_dates_this_subplot = [latest_date_for_subplot]
-                data_for_bars_this_subplot = current_mother_metric_data[current_mother_metric_data['consoValueDate'] == latest_date_for_subplot]
+                rows_for_bars_this_subplot = mother_metric_rows[
+                    self._date_values(mother_metric_rows) == self._date_keys(latest_date_for_subplot)
+                ]
 
-            if not actual_dates_this_subplot or data_for_bars_this_subplot.empty:
+            if not actual_dates_this_subplot or not rows_for_bars_this_subplot.size:
                 logging.info(f"No data for subplot {mother_metric} for determined dates: {actual_dates_this_subplot}")
-                fig.layout.annotations[idx-1].text = f"{mother_metric}<br>(No Data for Selected Dates)"
+                title_annotations[idx-1]['text'] = f"{mother_metric}<br>(No Data for Selected Dates)"
                 continue
             
             actual_dates_this_subplot.sort() 
+            xref, yref = self._subplot_axis_refs(row, col)
 
             for plot_date in actual_dates_this_subplot:
-                date_specific_data = data_for_bars_this_subplot[data_for_bars_this_subplot['consoValueDate'] == plot_date]
+                date_specific_rows = rows_for_bars_this_subplot[
+                    self._date_values(rows_for_bars_this_subplot) == self._date_keys(plot_date)
+                ]
                 
-                if date_specific_data.empty:
+                if not date_specific_rows.size:
                     continue
 
-                y_values = []
-                text_values = []
-                value_map = date_specific_data.set_index('consoMreMetricName')['consoValue']
-                
-                for m_name in metrics:
-                    value = value_map.get(m_name, None)
-                    y_values.append(value)
-                    text_values.append(f"{value:.2f}" if pd.notna(value) else "")
+                y_values, text_values = self._bar_values(date_specific_rows, metrics)
 
                 current_date_str = plot_date.strftime('%Y-%m-%d')
                 is_first_occurrence_for_legend = current_date_str not in dates_already_in_legend
 
-                fig.add_trace(
-                    go.Bar(
-                        x=metrics,
-                        y=y_values,
-                        text=text_values,
-                        textposition='auto',
-                        name=current_date_str, 
-                        legendgroup=current_date_str, 
-                        showlegend=dates_provided_by_user and is_first_occurrence_for_legend
-                    ),
-                    row=row,
-                    col=col
-                )
+                traces.append(dict(
+                    type='bar',
+                    x=metrics,
+                    y=y_values,
+                    text=text_values,
+                    textposition='auto',
+                    name=current_date_str, 
+                    legendgroup=current_date_str, 
+                    showlegend=dates_provided_by_user and is_first_occurrence_for_legend,
+                    xaxis=xref,
+                    yaxis=yref
+                ))
                 traces_added = True
                 if dates_provided_by_user and is_first_occurrence_for_legend:
                     dates_already_in_legend.add(current_date_str)
             
-            fig.update_xaxes(title_text=None, row=row, col=col, tickangle=-90, automargin=True)
-            fig.update_yaxes(title_text="Value", row=row, col=col, automargin=True)
+            xaxis_key, yaxis_key = self._subplot_axis_keys(row, col)
+            layout[xaxis_key].update(tickangle=-90, automargin=True)
+            layout[yaxis_key].update(title=dict(text="Value"), automargin=True)
         
         title_date_str = "Latest Available Data"
         if dates_provided_by_user:
@@ -594,8 +816,8 @@ class DataVisualizer:
         elif not traces_added:
             title_date_str = "No Data Available"
             
-        fig.update_layout(
-            title=f"{strana_node} - Grouped Bar Plots ({title_date_str})",
+        layout.update(
+            title=dict(text=f"{strana_node} - Grouped Bar Plots ({title_date_str})"),
             height=fixed_height,
             width=fixed_width,
             barmode='group',
@@ -604,12 +826,11 @@ class DataVisualizer:
             margin=dict(t=100, b=100, l=70, r=70) # Adjusted margins
         )
         
-        if output_file:
-            fig.write_html(output_file)
-        
-        return fig
+        return _finish_figure({'data': traces, 'layout': layout}, output_file, render)
 
 class VisualizationConfig:
+    __slots__ = ('plot_types',)
+
     def __init__(self):
         """Initialize visualization configuration."""
         self.plot_types = {}  # {(strana_node, metric_name): ['bar', 'time_series']}
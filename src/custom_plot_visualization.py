@@ -1,4 +1,5 @@
 import plotly.graph_objects as go
+import plotly.io as pio
 from plotly.subplots import make_subplots
 import os
 import pandas as pd
@@ -8,6 +9,18 @@ from datetime import datetime
 from pathlib import Path
 import logging
 
+# --- Shared Plot Styling ---
+
+# Layout shared by every pillar subplot figure, registered once at import so each
+# figure only references it by name instead of merging the same settings again.
+RISK_TEMPLATE_NAME = 'risk'
+pio.templates[RISK_TEMPLATE_NAME] = go.layout.Template(pio.templates['plotly_white'])
+pio.templates[RISK_TEMPLATE_NAME].layout.update(
+    plot_bgcolor='white',
+    hovermode='x unified', # Improved hover experience
+    title_x=0.5 # Center the main title
+)
+
 # --- Configuration for Multiple Datasets ---
 
 # Define mapping configurations
@@ -154,14 +167,20 @@ def create_category_plots(df: pd.DataFrame, output_dir: str, dataset_id: str) ->
     unique_categories = df['Product Category'].unique()
     logging.info(f"Creating category plots for {dataset_id}. Categories: {unique_categories}")
 
+    # Pull the columns out once; categories and pillars are then selected with numpy masks
+    category_arr = df['Product Category'].to_numpy()
+    pillar_arr = df['Projected Pillar'].to_numpy()
+    dates_arr = df['pricingdate'].to_numpy()
+    cvs_arr = df['Validated Value Projected CV'].to_numpy()
+
     for category in unique_categories:
         try:
-            category_data = df[df['Product Category'] == category]
-            if category_data.empty:
+            mask_cat = category_arr == category
+            if not mask_cat.any():
                 logging.warning(f"No data for category '{category}' in dataset '{dataset_id}'. Skipping plot.")
                 continue
 
-            pillars = sorted(category_data['Projected Pillar'].unique())
+            pillars = sorted(pd.unique(pillar_arr[mask_cat]))
             num_pillars = len(pillars)
             if num_pillars == 0:
                 logging.warning(f"No pillars found for category '{category}' in dataset '{dataset_id}'. Skipping plot.")
@@ -181,22 +200,24 @@ def create_category_plots(df: pd.DataFrame, output_dir: str, dataset_id: str) ->
                 subplot_titles=[str(p) for p in pillars], # Use pillar names as subplot titles
                 vertical_spacing=vertical_spacing,
                 horizontal_spacing=0.15,
-                shared_xaxes=False # Keep x-axes independent
+                shared_xaxes=False, # Keep x-axes independent
+                x_title="Date",
+                y_title="Aggregated CV Value"
             )
 
             for idx, pillar in enumerate(pillars):
                 row = (idx // num_cols) + 1
                 col = (idx % num_cols) + 1
-                pillar_data = category_data[category_data['Projected Pillar'] == pillar]
+                mask = mask_cat & (pillar_arr == pillar)
 
-                if pillar_data.empty:
+                if not mask.any():
                      logging.warning(f"No data for pillar '{pillar}' in category '{category}', dataset '{dataset_id}'. Skipping trace.")
                      continue
 
                 fig.add_trace(
                     go.Scatter(
-                        x=pillar_data['pricingdate'],
-                        y=pillar_data['Validated Value Projected CV'],
+                        x=dates_arr[mask],
+                        y=cvs_arr[mask],
                         mode='lines+markers',
                         name=str(pillar), # Legend entry (though legend is hidden)
                         showlegend=False # Individual trace legends off
@@ -204,18 +225,13 @@ def create_category_plots(df: pd.DataFrame, output_dir: str, dataset_id: str) ->
                     row=row,
                     col=col
                 )
-                fig.update_xaxes(title_text="Date", row=row, col=col)
-                fig.update_yaxes(title_text="Aggregated CV Value", row=row, col=col)
 
             # Update overall layout for the category plot
             fig.update_layout(
                 title=f"{dataset_id} - {category.upper()} - Time Series by Projected Pillar",
                 height=height,
                 width=width,
-                plot_bgcolor='white',
-                template="plotly_white", # Consistent theme
-                hovermode='x unified', # Improved hover experience
-                title_x=0.5 # Center the main title
+                template=RISK_TEMPLATE_NAME # Consistent theme
                 # showlegend=True # Optionally show legend if needed later
             )
     
@@ -246,7 +262,11 @@ def create_overall_plot(df: pd.DataFrame, output_dir: str, dataset_id: str) -> O
         Path to the generated plot file, or None if generation fails or no data.
     """
     try:
-        pillars = sorted(df['Projected Pillar'].unique())
+        pillar_arr = df['Projected Pillar'].to_numpy()
+        dates_arr = df['pricingdate'].to_numpy()
+        cvs_arr = df['Validated Value Projected CV'].to_numpy()
+
+        pillars = sorted(pd.unique(pillar_arr))
         num_pillars = len(pillars)
         if num_pillars == 0:
             logging.warning(f"No pillars found for overall plot in dataset '{dataset_id}'. Skipping.")
@@ -265,22 +285,24 @@ def create_overall_plot(df: pd.DataFrame, output_dir: str, dataset_id: str) -> O
             subplot_titles=[str(p) for p in pillars],
             vertical_spacing=vertical_spacing,
             horizontal_spacing=0.15,
-            shared_xaxes=False
+            shared_xaxes=False,
+            x_title="Date",
+            y_title="Aggregated CV Value"
         )
 
         for idx, pillar in enumerate(pillars):
             row = (idx // num_cols) + 1
             col = (idx % num_cols) + 1
-            pillar_data = df[df['Projected Pillar'] == pillar]
+            mask = pillar_arr == pillar
 
-            if pillar_data.empty:
+            if not mask.any():
                 logging.warning(f"No data for overall pillar '{pillar}', dataset '{dataset_id}'. Skipping trace.")
                 continue
 
             fig.add_trace(
                 go.Scatter(
-                    x=pillar_data['pricingdate'],
-                    y=pillar_data['Validated Value Projected CV'],
+                    x=dates_arr[mask],
+                    y=cvs_arr[mask],
                     mode='lines+markers',
                     name=str(pillar),
                     showlegend=False
@@ -288,18 +310,13 @@ def create_overall_plot(df: pd.DataFrame, output_dir: str, dataset_id: str) -> O
                 row=row,
                 col=col
             )
-            fig.update_xaxes(title_text="Date", row=row, col=col)
-            fig.update_yaxes(title_text="Aggregated CV Value", row=row, col=col)
 
         # Update overall layout
         fig.update_layout(
             title=f"{dataset_id} - Overall Time Series by Projected Pillar (All Categories)",
             height=height,
             width=width,
-            plot_bgcolor='white',
-            template="plotly_white",
-            hovermode='x unified',
-            title_x=0.5
+            template=RISK_TEMPLATE_NAME
         )
 
         # Include dataset_id in the filename
@@ -443,6 +460,7 @@ def update_main_html(main_html_file, plot_configurations_list):
         logging.info(f"Created new dashboard template file at {main_html_file}")
 
     all_metric_cards_html = ""
+    metric_cards = []
     main_html_dir = os.path.dirname(main_html_file)
 
     if not plot_configurations_list:
@@ -465,11 +483,12 @@ def update_main_html(main_html_file, plot_configurations_list):
                         <span class="metric-name">{plot_config.get("metric_name", "Unnamed Plot")}</span>
                         <a href="{relative_plot_path}" target="_blank" aria-label="View {plot_config.get("metric_name", "Unnamed Plot")}"></a>
                     </div>'''
-                all_metric_cards_html += metric_card_html
+                metric_cards.append(metric_card_html)
             except KeyError as e:
                 logging.error(f"Skipping plot config due to missing key: {e}. Config: {plot_config}")
             except Exception as e:
                  logging.error(f"Error generating metric card for {plot_config.get('plot_html_file', 'N/A')}: {e}")
+        all_metric_cards_html = "".join(metric_cards)
 
 
     # --- Create/Update the 'Custom Plots' section ---
@@ -1,6 +1,7 @@
 """Module for generating HTML dashboard content."""
 
 import logging
+from functools import lru_cache
 from pathlib import Path
 from typing import Dict, List
 
@@ -23,8 +24,9 @@ class DashboardTemplate:
         """
     
     @staticmethod
+    @lru_cache(maxsize=None)
     def get_css_styles():
-        """Return the CSS styles for the dashboard."""
+        """Return the CSS styles for the dashboard (built once and cached)."""
         return f"""
         :root {{
             {DashboardTemplate.get_css_variables()}
@@ -208,7 +210,7 @@ class HTMLGenerator:
     @staticmethod
     def _generate_html_content(plots_by_node: Dict[str, List[Dict]], output_dir: Path) -> str:
         """Generate the complete HTML content for the dashboard."""
-        html_content = f"""
+        parts = [f"""
 <!DOCTYPE html>
 <html lang="en">
 <head>
@@ -224,28 +226,28 @@ class HTMLGenerator:
         <h1>Risk Metrics Dashboard</h1>
         <p> Visualization of financial risk metrics and time series data</p>
     </div>
-"""
+"""]
 
         # Sort nodes alphabetically
         sorted_nodes = sorted(plots_by_node.keys())
 
         for node in sorted_nodes:
-            html_content += HTMLGenerator._generate_node_section(node, plots_by_node[node], output_dir)
+            parts.append(HTMLGenerator._generate_node_section(node, plots_by_node[node], output_dir))
 
-        html_content += """
+        parts.append("""
 </body>
 </html>
-"""
-        return html_content
+""")
+        return "".join(parts)
 
     @staticmethod
     def _generate_node_section(node: str, plots: List[Dict], output_dir: Path) -> str:
         """Generate HTML content for a single node section."""
-        section_content = f"""
+        parts = [f"""
     <section class="node-section">
         <h2>{node}</h2>
         <div class="metrics-grid">
-"""
+"""]
         # Sort plots within each node for consistency
         sorted_plots = sorted(plots, key=lambda x: (x['plot_type'], 
                             ",".join(x['metrics']) if isinstance(x['metrics'], list) else x['metrics']))
@@ -256,15 +258,15 @@ class HTMLGenerator:
             metrics_display = ", ".join(info['metrics']) if isinstance(info['metrics'], list) else info['metrics']
             relative_path = Path(info['output_file']).relative_to(output_dir)
             
-            section_content += f"""
+            parts.append(f"""
             <div class="metric-card">
                 <span class="metric-type {plot_type_class}">{plot_type_display}</span>
                 <span class="metric-name">{metrics_display}</span>
                 <a href="{relative_path}" target="_blank" aria-label="View {metrics_display} {plot_type_display}"></a>
-            </div>"""
+            </div>""")
         
-        section_content += """
+        parts.append("""
         </div>
-    </section>"""
+    </section>""")
         
-        return section_content 
\ No newline at end of file
+        return "".join(parts) 
\ No newline at end of file
@@ -1,312 +1,467 @@
 import pandas as pd
-import plotly.graph_objects as go
+import plotly.io as pio
 from plotly.subplots import make_subplots
 import os
+import json
+import gzip
+import shutil
+import hashlib
+import html
+import re
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from pathlib import Path
+from string import Template
 import numpy as np
+from pandas.tseries.api import guess_datetime_format
+
+try:
+    from src.utils import CSV_ENGINE, compact_string_columns, lttb_downsample
+except ImportError: # Run directly as a script from within src/
+    from utils import CSV_ENGINE, compact_string_columns, lttb_downsample
+
+# Bar colors for the attribution columns of a level, cycled when a level has more columns
+_PALETTE = ('#f1b7b4', '#ffd7d4', '#e2a92c', '#ddb27d', '#9a67bd',
+            '#b086d0', '#c7a7e2', '#877f7f', '#acb0d2', '#75aecf')
+
+# Plotly config for the written figures; a fixed div_id per figure also keeps reruns on
+# unchanged data byte-identical
+_PLOT_CONFIG = {'responsive': True, 'displaylogo': False}
+
+# PNL_KEEP_FLOAT64=1 (or true) keeps the attribution values in full float64 precision
+KEEP_FLOAT64 = os.environ.get('PNL_KEEP_FLOAT64', '').strip().lower() in ('1', 'true')
+PNL_FLOAT_DTYPE = 'float64' if KEEP_FLOAT64 else 'float32'
+
+# Figures with more rows than this are LTTB-downsampled to this many points
+MAX_PLOT_POINTS = 2000
+
+# orjson serializes numpy arrays natively; plotly falls back to its JSON encoder otherwise
+try:
+    import orjson  # noqa: F401
+    pio.json.config.default_engine = 'orjson'
+except ImportError:
+    pass
+
+def _read_csv_fast(file_path, **kwargs):
+    """
+    Read a CSV with the pyarrow engine when it is installed, otherwise with the C parser
+    reading the file in one pass (low_memory=False) and caching repeated date strings.
+    """
+    if CSV_ENGINE == 'pyarrow':
+        return pd.read_csv(file_path, engine='pyarrow', **kwargs)
+    return pd.read_csv(file_path, engine='c', low_memory=False, cache_dates=True, **kwargs)
+
+def _cumsum_by_year(df, cols):
+    """
+    Cumulative sums of cols that restart every year. All columns are summed in one numpy
+    cumsum over the rows ordered by year; each year's rows then have the running total
+    reached before that year (from np.add.reduceat year sums) subtracted. Rows are only
+    reordered when the years are not already ascending (e.g. input not sorted by date).
+    """
+    years = df['Year'].to_numpy()
+    # Values stay in their stored (float32) dtype; the sums accumulate in float64
+    values = df[cols].to_numpy()
+    if len(years) == 0:
+        return df[cols].cumsum()
+
+    order = None
+    if np.any(years[1:] < years[:-1]):
+        order = np.argsort(years, kind='stable')
+        years = years[order]
+        values = values[order]
+
+    starts = np.flatnonzero(np.r_[True, years[1:] != years[:-1]])
+    lengths = np.diff(np.r_[starts, len(years)])
+    # Running total at the start of each year, from the per-year sums
+    year_sums = np.add.reduceat(values, starts, axis=0, dtype=np.float64)
+    before_year = np.cumsum(year_sums, axis=0) - year_sums
+    result = np.cumsum(values, axis=0, dtype=np.float64) - np.repeat(before_year, lengths, axis=0)
+
+    if order is not None:
+        unsorted = np.empty_like(result)
+        unsorted[order] = result
+        result = unsorted
+        years = df['Year'].to_numpy()
+
+    if years.dtype.kind == 'f' and np.isnan(years).any():
+        # Rows without a year belong to no group, as with groupby
+        result[np.isnan(years)] = np.nan
+        return pd.DataFrame(result, index=df.index, columns=cols)
+
+    dtypes = df[cols].dtypes
+    if dtypes.nunique() == 1:
+        # Uniform columns (the float32 attribution data) stay one contiguous 2-D block
+        return pd.DataFrame(result.astype(dtypes.iloc[0], copy=False), index=df.index, columns=cols)
+    return pd.DataFrame(result, index=df.index, columns=cols).astype(dtypes.to_dict())
 
 def load_data(file_path):
-    """Load and preprocess the PML and income attribution data."""
-    if not os.path.exists(file_path):
+    """
+    Load and preprocess the PML and income attribution data.
+    The per-year cumulative sums are returned as '<column>_Cumulative' columns of the same
+    frame, added as one float32 block, so that sorting, per-year splits and downsampling
+    keep them aligned with the dates.
+    """
+    if not Path(file_path).exists():
         raise FileNotFoundError(f"Input file not found: {file_path}")
 
-    df = pd.read_csv(file_path)
+    # Parse the date column while reading instead of converting it afterwards. The format
+    # is guessed once from the first row so the parser skips per-value format inference;
+    # repeated date strings are parsed once via the parser's date cache.
+    head = pd.read_csv(file_path, nrows=1)
+    if 'Context.AsOfDate' not in head.columns:
+        raise KeyError("The required column 'Context.AsOfDate' is missing in the input data.")
+    date_format = None
+    if len(head):
+        date_format = guess_datetime_format(str(head['Context.AsOfDate'].iloc[0]))
+    # The DTD attribution columns are read straight into their float dtype (see below)
+    dtype = {col: PNL_FLOAT_DTYPE for col in head.columns if '.DTD' in col}
+    df = _read_csv_fast(file_path, parse_dates=['Context.AsOfDate'], date_format=date_format, dtype=dtype)
+    # Rows not matching the guessed format leave the column unparsed; those dates are then
+    # parsed one by one, each with its own format
+    if not pd.api.types.is_datetime64_any_dtype(df['Context.AsOfDate']):
+        try:
+            df['Context.AsOfDate'] = pd.to_datetime(df['Context.AsOfDate'], format='mixed')
+        except (ValueError, TypeError) as e:
+            raise ValueError(f"Column 'Context.AsOfDate' contains values that are not dates: {e}") from e
 
     # Remove columns with all null values
     df = df.dropna(axis=1, how='all')
 
-    # Fill null values with 0
-    df = df.fillna(0)
+    # Fill null values with 0, leaving the parsed dates untouched
+    df = df.fillna({col: 0 for col in df.columns if col != 'Context.AsOfDate'})
 
-    # Convert Context.AsOfDate to datetime and extract year
-    if 'Context.AsOfDate' in df.columns:
-        df['Context.AsOfDate'] = pd.to_datetime(df['Context.AsOfDate'])
-        df['Year'] = df['Context.AsOfDate'].dt.year
-    else:
-        raise KeyError("The required column 'Context.AsOfDate' is missing in the input data.")
+    # Repeated labels (e.g. the profit center) are stored once as categoricals
+    compact_string_columns(df)
+
+    # Attribution values only need display precision; float32 halves the bytes moved by
+    # the cumulative sums and the plot serialization (the cumulative columns keep the
+    # dtype), unless PNL_KEEP_FLOAT64 is set.
+    if not KEEP_FLOAT64:
+        float_cols = df.select_dtypes('float64').columns
+        df[float_cols] = df[float_cols].astype('float32')
+
+    # Extract year; int16 is enough for calendar years (rows with missing dates keep a
+    # float NaN year)
+    year = df['Context.AsOfDate'].dt.year
+    df['Year'] = year if year.hasnans else year.astype('int16')
 
     # Check if the required column exists
     if 'PnL Explanation.DTD' not in df.columns:
         raise KeyError("The required column 'PnL Explanation.DTD' is missing in the input data.")
 
-    # Calculate cumulative sum for the PnL Explanation.DTD for each year
-    df['PnL Explanation.DTD_Cumulative'] = df.groupby('Year')['PnL Explanation.DTD'].cumsum()
-
-    # Calculate cumulative sums for all attribution columns (within each year)
-    for col in df.columns:
-        # skip non-attribution columns
-        if col.endswith('_Cumulative') or col == "PnL Explanation.DTD" or col in ["Context.AsOfDate", "Year"]:
-            continue
-
-        if 'L' in col and '.DTD' in col:
-            df[f'{col}_Cumulative'] = df.groupby('Year')[col].cumsum()
-        elif '.DTD' in col and 'L' not in col: # Handle "Mother" level columns
-            df[f'{col}_Cumulative'] = df.groupby('Year')[col].cumsum()
+    # Calculate cumulative sums for PnL Explanation.DTD and all attribution columns
+    # (Mother and L* levels) within each year in a single pass
+    is_attr = (df.columns.str.contains('.DTD', regex=False)
+               & ~df.columns.str.endswith('_Cumulative')
+               & ~df.columns.isin(["PnL Explanation.DTD", "Context.AsOfDate", "Year"]))
+    attr_cols = ['PnL Explanation.DTD'] + list(df.columns[is_attr])
+    # All cumulative columns are attached in one concat rather than one insertion per column
+    cumulative = _cumsum_by_year(df, attr_cols).set_axis([f'{col}_Cumulative' for col in attr_cols], axis=1)
+    df = pd.concat([df, cumulative], axis=1)
     return df
 
+# Level number directly after the first '_L' of a column name (e.g. 'Rates_L2.DTD' -> '2')
+# Compiled once; the unrolled "[^_]* (_ not followed by L)" form scans each column name
+# without a lookahead at every character.
+_LEVEL_PATTERN = re.compile(r'^[^_\n]*(?:_(?!L)[^_\n]*)*_L(\d+)(?=\.|_L|$)')
+
 def identify_level_columns(df):
     """Identifies columns by their level (Mother, L1, L2, etc.) and group them."""
-    level_groups = {}
     mother_level_key = "Mother"
+    cols = df.columns
+
+    # DTD attribution columns, skipping cumulative columns and the primary PnL Explanation column
+    is_dtd = (cols.str.contains('.DTD', regex=False)
+              & ~cols.str.endswith('_Cumulative')
+              & (cols != 'PnL Explanation.DTD'))
+    has_level = cols.str.contains('_L', regex=False)
+
+    # Parse the level (e.g., L1, L2, etc.) of every column in one vectorized pass
+    level_parts = cols.str.extract(_LEVEL_PATTERN, expand=False)
+    level_mask = is_dtd & has_level & level_parts.notna()
+    level_cols = cols[level_mask]
+    level_parts = level_parts[level_mask]
+
+    # "Mother" first, then numeric levels (_L1, _L2, ...) ordered by a single stable
+    # argsort on the level number, keeping column order within each level
+    level_groups = {}
+    mother_cols = list(cols[is_dtd & ~has_level])
+    if mother_cols:
+        level_groups[mother_level_key] = mother_cols
+    level_numbers = level_parts.astype(np.int64).to_numpy()
+    for idx in np.argsort(level_numbers, kind='stable'):
+        level_groups.setdefault(f"_L{level_parts[idx]}", []).append(level_cols[idx])
 
-    for col in df.columns:
-        # Skip cumulative columns and the primary PnL Explanation column
-        if col.endswith('_Cumulative'):
-            continue
-        if col == 'PnL Explanation.DTD':
-            continue
-
-        if '.DTD' in col:
-            if '_L' in col:
-                try:
-                    # Parse the level (e.g., L1, L2, etc.)
-                    level_part = col.split('_L')[1].split('.')[0] # Changed variable name from level to level_part
-                    if level_part.isdigit(): # Check if level_part is a digit
-                        level = f"_L{level_part}" # e.g. _L1
-                        if level not in level_groups:
-                            level_groups[level] = []
-                        level_groups[level].append(col)
-                except IndexError:
-                    continue # or handle error appropriately
-            else: 
-                if mother_level_key not in level_groups:
-                    level_groups[mother_level_key] = []
-                level_groups[mother_level_key].append(col)
-
-    # Sort the levels: "Mother" first, then numeric levels (_L1, _L2) sorted correctly
-    sorted_level_keys = []
-    if mother_level_key in level_groups:
-        sorted_level_keys.append(mother_level_key)
-    
-    # Extract and sort numeric keys like _L1, _L2
-    numeric_keys = sorted(
-        [k for k in level_groups if k.startswith('_L') and k[2:].isdigit()],
-        key=lambda k: int(k[2:])
-    )
-    sorted_level_keys.extend(numeric_keys)
-    
-    # Add any other keys that might not fit the pattern (e.g., if new levels are added without "_L" prefix)
-    # This part might need adjustment if other patterns exist.
-    other_keys = sorted([k for k in level_groups if k not in sorted_level_keys])
-    sorted_level_keys.extend(other_keys)
-
-
-    return {key: level_groups[key] for key in sorted_level_keys if key in level_groups}
+    return level_groups
 
 
-def create_yearly_visualizations(df, viz_output_dir):
+def _date_axis_positions(dates, max_ticks):
     """
-    Create separate visualizations for each year and save them as HTML files.
-    Each visualization shows multi-level cumulative attribution and the PnL Explanation line.
-    The x-axis uses a categorical format (with a subset of tick labels) to avoid white spaces.
+    Map date-sorted rows to integer x positions, one per distinct day, so every trace shares
+    a compact numeric x array instead of repeating formatted date strings. Positions are
+    consecutive, which keeps the axis free of gaps for missing days.
+    Returns the positions, the label of every position (e.g. 'Dec 12, 2024', indexed by
+    position for hover text) and the tick positions of at most max_ticks evenly spread dates.
     """
-    visualization_files = {}
-    years = sorted(df['Year'].unique())
-
-    for year in years:
-        df_year = df[df['Year'] == year].copy().sort_values("Context.AsOfDate")
-
-        # Create a new column with formatted date strings (e.g., 'Dec 12, 2024')
-        df_year['formattedDate'] = df_year['Context.AsOfDate'].dt.strftime('%b %d, %Y')
-
-        # Compute a subset of tick values for the x-axis to avoid clutter
-        unique_dates = list(dict.fromkeys(df_year['formattedDate']).keys()) # Preserve order
-        if len(unique_dates) > 10:
-            indices = np.linspace(0, len(unique_dates) - 1, 10, dtype=int)
-            tickvals = [unique_dates[i] for i in indices]
-        else:
-            tickvals = unique_dates
-
-        level_groups = identify_level_columns(df_year)
-        num_levels = len(level_groups)
-        if num_levels == 0: # No attribution columns found for this year
-            continue
-
-        # Create figure with a subplot per attribution level
-        fig = make_subplots(
-            rows=num_levels,
-            cols=1,
-            subplot_titles=[f'{level} (Year {year}) Cumulative Attribution & Result' for level in level_groups.keys()],
-            vertical_spacing=0.15,
-        )
-
-        colors = ['#f1b7b4', '#ffd7d4', '#e2a92c', '#ddb27d', '#9a67bd',
-                  '#b086d0', '#c7a7e2', '#877f7f', '#acb0d2', '#75aecf']
-
-
-        for idx, (level, columns) in enumerate(level_groups.items()):
-            row_idx = idx + 1
-            for col_idx, col in enumerate(columns):
-                base_name = col.split('.')[0].strip() # If 'L' in col else col.split('.')[0].strip()
-                name = f"Level {level}: {base_name}"
-                cumulative_col = f'{col}_Cumulative'
-                fig.add_trace(
-                    go.Bar(
-                        name=name,
-                        x=df_year['formattedDate'],
-                        y=df_year[cumulative_col],
-                        marker_color=colors[col_idx % len(colors)],
-                        showlegend=True,
-                    ),
-                    row=row_idx,
-                    col=1,
-                )
-
-            fig.add_trace(
-                go.Scatter(
-                    name='Cumulative PnL Explanation',
-                    x=df_year['formattedDate'],
-                    y=df_year['PnL Explanation.DTD_Cumulative'],
-                    line=dict(color='black', width=2),
-                    mode='lines',
-                    showlegend=(idx == 0), # Show legend only for the first subplot for consistency
-                ),
-                row=row_idx,
-                col=1,
-            )
-
-            # Update x-axis for each subplot:
-            # Use a categorical type (to remove gaps) and specify a subset of tick values
-            fig.update_xaxes(
-                title_text="Date",
-                row=row_idx,
-                col=1,
-                type="category",
-                tickmode="array",
-                tickvals=tickvals,
-            )
-            fig.update_yaxes(title_text="Cumulative Value", row=idx+1, col=1) # Corrected loop variable
-
-        fig.update_layout(
-            title_text=f'Cumulative PML Attribution - All Levels for {year}',
-            height=400 * num_levels + 150,
-            # width=1200, # Adjust as needed
-            plot_bgcolor='plotly_white',
-            showlegend=True,
-            legend=dict(
-                yanchor="top",
-                y=0.99, # Adjusted y to be just below the title
-                xanchor="left",
-                x=1.05, # Adjusted x to be to the right of the plots
-                traceorder='normal',
-            ),
-            barmode='relative', # Stack bars
-            bargap=0.15,
-            bargroupgap=0.1
-        )
-
-        output_path = os.path.join(viz_output_dir, f'pnl_attribution_all_levels_cumulative_{year}.html')
-        fig.write_html(output_path)
-        visualization_files[year] = output_path
-
-    return visualization_files
+    # Factorize the days themselves (as day-resolution integers, no per-row timestamps or
+    # strings); each distinct day is then formatted once
+    positions, days = pd.factorize(dates.to_numpy().astype('datetime64[D]'))
+    day_labels = pd.DatetimeIndex(days).strftime('%b %d, %Y').to_numpy(dtype=object)
+    if len(days) > max_ticks:
+        tickvals = np.linspace(0, len(days) - 1, max_ticks, dtype=int)
+    else:
+        tickvals = np.arange(len(days))
+    return positions, day_labels, tickvals
 
-def create_all_years_visualization(df, viz_output_dir):
+def _downsample_rows(df, x_positions, max_points=MAX_PLOT_POINTS):
     """
-    Create a single visualization for all years combined.
-    Cumulative sums are calculated per year and then plotted continuously.
-    The x-axis uses a categorical format.
+    Keep at most max_points days of a date-sorted frame, chosen by LTTB on the cumulative
+    PnL Explanation line (its value at the last row of each day). Every row of a kept day
+    is kept, so no day loses part of its stacked bars and all traces stay aligned. Every
+    row must have a date, i.e. a non-negative x position.
+    Returns the (possibly reduced) frame and its x positions.
+    """
+    if len(df) <= max_points:
+        return df, x_positions
+    # Rows of a day are consecutive; the last row of each run stands for its day
+    last_rows = np.flatnonzero(np.r_[x_positions[1:] != x_positions[:-1], True])
+    if len(last_rows) <= max_points:
+        return df, x_positions
+    pnl_cumulative = df['PnL Explanation.DTD_Cumulative'].to_numpy()
+    kept_days = x_positions[last_rows[lttb_downsample(x_positions[last_rows], pnl_cumulative[last_rows], max_points)]]
+    keep_day = np.zeros(x_positions.max() + 1, dtype=bool)
+    keep_day[kept_days] = True
+    kept = np.flatnonzero(keep_day[x_positions])
+    return df.iloc[kept], x_positions[kept]
+
+def _level_trace_specs(level_groups):
     """
-    df_all_years = df.copy().sort_values("Context.AsOfDate")
+    Trace name and cumulative column of every attribution column, keyed by level
+    (e.g. {'_L1': [('Level _L1: Rates_L1', 'Rates_L1.DTD_Cumulative'), ...]}).
+    Computed once and shared by all figures built from the same columns.
+    """
+    return {
+        level: [(f"Level {level}: {col.split('.')[0].strip()}", f'{col}_Cumulative') for col in columns]
+        for level, columns in level_groups.items()
+    }
 
-    df_all_years['formattedDate'] = df_all_years['Context.AsOfDate'].dt.strftime('%b %d, %Y')
+# Hover shows the row's date (x is only a day position) and value, with the trace name
+_HOVER_TEMPLATE = '%{customdata}<br>%{y}<extra>%{fullData.name}</extra>'
 
-    unique_dates = list(dict.fromkeys(df_all_years['formattedDate']).keys())
-    if len(unique_dates) > 20: 
-        indices = np.linspace(0, len(unique_dates) - 1, 20, dtype=int)
-        tickvals = [unique_dates[i] for i in indices]
-    else:
-        tickvals = unique_dates
+def _level_traces(df, x_positions, trace_specs, hover_dates):
+    """
+    Stacked bar traces for every attribution column plus the cumulative PnL Explanation
+    line, one group per level of trace_specs (see _level_trace_specs). hover_dates holds
+    the formatted date of every row. Returns the traces and their subplot rows so the
+    whole figure can be filled with a single add_traces call.
+    Traces are plain dicts, so they are validated once by add_traces rather than also on
+    construction.
+    """
+    pnl_cumulative = df['PnL Explanation.DTD_Cumulative'].to_numpy()
+
+    traces, rows = [], []
+    for idx, specs in enumerate(trace_specs.values()):
+        for col_idx, (name, cumulative_col) in enumerate(specs):
+            traces.append(dict(
+                type='bar',
+                name=name,
+                x=x_positions,
+                y=df[cumulative_col].to_numpy(),
+                marker_color=_PALETTE[col_idx % len(_PALETTE)],
+                customdata=hover_dates,
+                hovertemplate=_HOVER_TEMPLATE,
+                showlegend=True,
+            ))
+            rows.append(idx + 1)
+
+        traces.append(dict(
+            type='scatter',
+            name='Cumulative PnL Explanation',
+            x=x_positions,
+            y=pnl_cumulative,
+            line=dict(color='black', width=2),
+            mode='lines',
+            customdata=hover_dates,
+            hovertemplate=_HOVER_TEMPLATE,
+            showlegend=(idx == 0), # Show legend only for the first subplot for consistency
+        ))
+        rows.append(idx + 1)
+    return traces, rows
+
+def _sorted_by_date(df):
+    """df in date order (stable); frames that are already sorted are returned as they are."""
+    if df['Context.AsOfDate'].is_monotonic_increasing:
+        return df
+    return df.sort_values('Context.AsOfDate', kind='mergesort')
+
+def _year_slices(df_sorted):
+    """
+    Split a date-sorted frame into {year: rows of that year} using positional slices
+    (no boolean masks or row gathers). Rows without a year are left out, as with groupby.
+    """
+    years = df_sorted['Year'].to_numpy()
+    bounds = np.r_[np.flatnonzero(np.r_[True, years[1:] != years[:-1]]), len(years)]
+    return {
+        years[start].item(): df_sorted.iloc[start:stop]
+        for start, stop in zip(bounds[:-1], bounds[1:])
+        if len(years) and not pd.isna(years[start])
+    }
+
+def _yearly_output_path(viz_output_dir, year):
+    return Path(viz_output_dir) / f'pnl_attribution_all_levels_cumulative_{year}.html'
+
+def _build_figure(df, trace_specs, subplot_label, title_text, max_ticks):
+    """
+    Build the multi-level cumulative attribution figure shared by the yearly and the
+    all-years visualizations: one subplot per level with stacked bars for its columns and
+    the cumulative PnL Explanation line. df must already be sorted by date.
+    """
+    num_levels = len(trace_specs)
 
-    level_groups = identify_level_columns(df_all_years)
-    num_levels = len(level_groups)
-    if num_levels == 0:
-        print("No attribution columns found for the 'All Years' visualization.")
-        return None
+    # Shared x positions for all traces, and a subset of tick labels to avoid clutter
+    x_positions, day_labels, tickvals = _date_axis_positions(df['Context.AsOfDate'], max_ticks)
+    # Rows without a date (position -1) have no place on the axis and no hover label
+    dated = x_positions >= 0
+    if not dated.all():
+        df, x_positions = df[dated], x_positions[dated]
+    df, x_positions = _downsample_rows(df, x_positions)
 
+    # Create figure with a subplot per attribution level
     fig = make_subplots(
         rows=num_levels,
         cols=1,
-        subplot_titles=[f'{level} (All Years) Cumulative Attribution & Result' for level in level_groups.keys()],
+        subplot_titles=[f'{level} ({subplot_label}) Cumulative Attribution & Result' for level in trace_specs.keys()],
         vertical_spacing=0.15,
     )
 
-    colors = ['#f1b7b4', '#ffd7d4', '#e2a92c', '#ddb27d', '#9a67bd',
-              '#b086d0', '#c7a7e2', '#877f7f', '#acb0d2', '#75aecf']
-
-    for idx, (level, columns) in enumerate(level_groups.items()):
-        row_idx = idx + 1
-        for col_idx, col in enumerate(columns):
-            base_name = col.split('.')[0].strip()
-            name = f"Level {level}: {base_name}"
-            cumulative_col = f'{col}_Cumulative'
-            fig.add_trace(
-                go.Bar(
-                    name=name,
-                    x=df_all_years['formattedDate'],
-                    y=df_all_years[cumulative_col],
-                    marker_color=colors[col_idx % len(colors)],
-                    showlegend=True,
-                ),
-                row=row_idx,
-                col=1,
-            )
-
-        fig.add_trace(
-            go.Scatter(
-                name='Cumulative PnL Explanation',
-                x=df_all_years['formattedDate'],
-                y=df_all_years['PnL Explanation.DTD_Cumulative'],
-                line=dict(color='black', width=2),
-                mode='lines',
-                showlegend=(idx == 0), 
-            ),
-            row=row_idx,
-            col=1,
-        )
+    traces, rows = _level_traces(df, x_positions, trace_specs, day_labels[x_positions])
+    fig.add_traces(traces, rows=rows, cols=1)
 
-        fig.update_xaxes(
-            title_text="Date",
-            row=row_idx,
-            col=1,
-            type="category",
-            tickmode="array",
-            tickvals=tickvals,
-        )
-        fig.update_yaxes(title_text="Cumulative Value", row=row_idx, col=1)
+    # Every subplot labels its date positions with the same subset of tick values
+    fig.update_xaxes(title_text="Date", tickmode="array", tickvals=tickvals, ticktext=list(day_labels[tickvals]))
+    fig.update_yaxes(title_text="Cumulative Value")
 
     fig.update_layout(
-        title_text='Cumulative PML Attribution - All Levels (All Years)',
+        title_text=title_text,
         height=400 * num_levels + 150,
-        plot_bgcolor='plotly_white',
+        template='plotly_white',
         showlegend=True,
         legend=dict(
             yanchor="top",
-            y=0.99,
+            y=0.99, # Just below the title
             xanchor="left",
-            x=1.05,
+            x=1.05, # To the right of the plots
             traceorder='normal',
         ),
-        barmode='relative',
+        barmode='relative', # Stack bars
         bargap=0.15,
         bargroupgap=0.1
     )
+    return fig
+
+def _write_html(fig, output_path, div_id):
+    """
+    Write fig as a standalone HTML page. plotly.js is referenced from the CDN instead of
+    embedding the ~4MB bundle in every file, and the traces (built by this module) are not
+    validated again during serialization.
+    """
+    fig.write_html(output_path, include_plotlyjs='cdn', include_mathjax=False, validate=False,
+                   auto_open=False, config=_PLOT_CONFIG, div_id=div_id)
+
+def _build_and_write_year(year, df_year, trace_specs, viz_output_dir):
+    """
+    Build the cumulative attribution figure for a single year and write it to HTML.
+    df_year must already be sorted by date. Runs in a worker process; returns
+    (year, output_path).
+    """
+    fig = _build_figure(df_year, trace_specs, f'Year {year}',
+                        f'Cumulative PML Attribution - All Levels for {year}', max_ticks=10)
+
+    output_path = _yearly_output_path(viz_output_dir, year)
+    _write_html(fig, output_path, div_id=f'pnl-{year}')
+    return year, output_path
+
+def create_yearly_visualizations(df, viz_output_dir, max_workers=None, source_key=None, force=False,
+                                 level_groups=None):
+    """
+    Create separate visualizations for each year and save them as HTML files.
+    Each visualization shows multi-level cumulative attribution and the PnL Explanation line.
+    The x-axis uses one position per date (with a subset of tick labels) to avoid white spaces.
+    Years are independent, so their figures are built and written in a process pool.
+    When source_key (the input's _input_cache_key) is given, years whose HTML file was
+    recorded as built from that same input are kept as they are unless force is set.
+    level_groups can pass in an already computed identify_level_columns(df).
+    """
+    # Every year shares the same columns, so the level grouping and trace names are
+    # computed once
+    if level_groups is None:
+        level_groups = identify_level_columns(df)
+    if not level_groups: # No attribution columns found
+        return {}
+    trace_specs = _level_trace_specs(level_groups)
+
+    # Only the plotted columns are passed on, keeping the frames pickled to workers small.
+    # Date order (sorting only if the caller has not); every year is then a contiguous,
+    # date-ordered row range.
+    plot_cols = ['Context.AsOfDate', 'Year', 'PnL Explanation.DTD_Cumulative']
+    plot_cols += [cumulative_col for specs in trace_specs.values() for _, cumulative_col in specs]
+    dfs = _year_slices(_sorted_by_date(df[plot_cols]))
+
+    sources = _load_yearly_sources(viz_output_dir)
+    up_to_date = {}
+    if source_key is not None and not force:
+        for year in list(dfs):
+            output_path = _yearly_output_path(viz_output_dir, year)
+            if output_path.exists() and sources.get(output_path.name) == source_key:
+                up_to_date[year] = output_path
+                del dfs[year]
+    if not dfs:
+        return up_to_date
+
+    if len(dfs) <= 1 or max_workers == 1:
+        built = dict(map(_build_and_write_year, dfs.keys(), dfs.values(),
+                         repeat(trace_specs), repeat(viz_output_dir)))
+    else:
+        if max_workers is None:
+            max_workers = min(len(dfs), os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            built = dict(executor.map(_build_and_write_year, dfs.keys(), dfs.values(),
+                                      repeat(trace_specs), repeat(viz_output_dir)))
+
+    # Record which input each rebuilt file now comes from (unknown without a source_key)
+    for output_path in built.values():
+        if source_key is not None:
+            sources[output_path.name] = source_key
+        else:
+            sources.pop(output_path.name, None)
+    _save_yearly_sources(viz_output_dir, sources)
+    return dict(sorted({**up_to_date, **built}.items()))
+
+def create_all_years_visualization(df, viz_output_dir, level_groups=None):
+    """
+    Create a single visualization for all years combined.
+    Cumulative sums are calculated per year and then plotted continuously.
+    The x-axis uses one position per date.
+    level_groups can pass in an already computed identify_level_columns(df).
+    """
+    if level_groups is None:
+        level_groups = identify_level_columns(df)
+    if not level_groups:
+        print("No attribution columns found for the 'All Years' visualization.")
+        return None
+
+    fig = _build_figure(_sorted_by_date(df), _level_trace_specs(level_groups), 'All Years',
+                        'Cumulative PML Attribution - All Levels (All Years)', max_ticks=20)
 
     output_filename = 'pnl_attribution_all_levels_cumulative_all_years.html'
-    output_path = os.path.join(viz_output_dir, output_filename)
-    fig.write_html(output_path)
+    output_path = Path(viz_output_dir) / output_filename
+    _write_html(fig, output_path, div_id='pnl-all-years')
     
     return {"All Years": output_path}
 
-def update_dashboard_html(html_file, visualization_files):
-    """
-    Update the dashboard HTML to include links to all yearly visualizations
-    and the combined "All Years" visualization.
-    Each entry gets its own card with a link to the corresponding HTML file.
-    Uses HTML comments to make updates idempotent.
-    """
-    if not os.path.exists(html_file):
-        print(f"Dashboard HTML file not found: {html_file}. Creating a basic one.")
-        basic_html_content = """<!DOCTYPE html>
+# Minimal dashboard used when no index.html exists yet; the PML section is filled in
+# between its markers.
+_BASIC_DASHBOARD_HTML = """<!DOCTYPE html>
 <html lang="en">
 <head>
     <meta charset="UTF-8">
@@ -332,97 +487,214 @@ def update_dashboard_html(html_file, visualization_files):
 </body>
 </html>
 """
-        with open(html_file, "w") as f:
-            f.write(basic_html_content)
 
-    with open(html_file, "r") as f:
-        content = f.read()
 
-    section_start_marker = "<!-- PML_ATTRIBUTION_SECTION_START -->"
-    section_end_marker = "<!-- PML_ATTRIBUTION_SECTION_END -->"
-
-    new_section_inner_content = f'''
+# PML section of the dashboard and its per-visualization cards, parsed once at import
+_DASHBOARD_SECTION_TEMPLATE = Template('''
         <section class="node-section">
             <h2>PML Attribution Analysis</h2>
             <div class="metrics-grid">
-    '''
-    
+    ${cards}
+            </div>
+        </section>
+    ''')
+_DASHBOARD_CARD_TEMPLATE = Template('''
+                <div class="metric-card">
+                    <span class="metric-type time-series">${display_name}</span>
+                    <span class="metric-name">${card_title}</span>
+                    <a href="${href}" target="_blank" aria-label="${aria_label}">View Visualization</a>
+                </div>
+        ''')
+
+def update_dashboard_html(html_file, visualization_files):
+    """
+    Update the dashboard HTML to include links to all yearly visualizations
+    and the combined "All Years" visualization.
+    Each entry gets its own card with a link to the corresponding HTML file.
+    Uses HTML comments to make updates idempotent; the file is only rewritten (atomically)
+    when its content changes.
+    """
+    html_file = Path(html_file)
+    original_content = None
+    if html_file.exists():
+        content = original_content = html_file.read_text()
+    else:
+        # Start from the in-memory template; the file is written once below
+        print(f"Dashboard HTML file not found: {html_file}. Creating a basic one.")
+        content = _BASIC_DASHBOARD_HTML
+
+    section_start_marker = "<!-- PML_ATTRIBUTION_SECTION_START -->"
+    section_end_marker = "<!-- PML_ATTRIBUTION_SECTION_END -->"
+
+    html_dir = html_file.resolve().parent
+
     # Sort keys: "All Years" first, then numeric years ascending.
     sorted_keys = sorted(visualization_files.keys(), key=lambda k: (str(k) != "All Years", k))
 
+    cards = []
     for key in sorted_keys:
         viz_file = visualization_files[key]
         # Ensure relative_path uses forward slashes for HTML compatibility
-        relative_path = os.path.relpath(viz_file, os.path.dirname(html_file)).replace("\\", "/")
-        
-        display_name = str(key)
+        try:
+            relative_path = Path(viz_file).resolve().relative_to(html_dir).as_posix()
+        except ValueError: # Visualization stored outside the dashboard directory
+            relative_path = Path(os.path.relpath(viz_file, html_dir)).as_posix()
+
         card_title = "Cumulative PML Attribution - All Levels"
         aria_label_detail = f"for {key}"
-
         if key == "All Years":
             card_title = "Cumulative PML Attribution - All Levels (All Years)"
             aria_label_detail = "(All Years)"
-        
-        new_section_inner_content += f'''
-                <div class="metric-card">
-                    <span class="metric-type time-series">{display_name}</span>
-                    <span class="metric-name">{card_title}</span>
-                    <a href="{relative_path}" target="_blank" aria-label="View {card_title} {aria_label_detail}">View Visualization</a>
-                </div>
-        '''
-    new_section_inner_content += '''
-            </div>
-        </section>
-    '''
+
+        cards.append(_DASHBOARD_CARD_TEMPLATE.substitute(
+            display_name=html.escape(str(key)),
+            card_title=html.escape(card_title),
+            href=html.escape(relative_path),
+            aria_label=html.escape(f"View {card_title} {aria_label_detail}"),
+        ))
+    new_section_inner_content = _DASHBOARD_SECTION_TEMPLATE.substitute(cards="".join(cards))
 
     # Construct the full new section with markers
     full_new_section = f"{section_start_marker}\n{new_section_inner_content}\n{section_end_marker}"
 
     start_idx = content.find(section_start_marker)
-    end_idx = content.find(section_end_marker)
+    end_idx = content.find(section_end_marker, start_idx) if start_idx != -1 else -1
 
     if start_idx != -1 and end_idx != -1:
         # Replace existing section
         content = content[:start_idx] + full_new_section + content[end_idx + len(section_end_marker):]
     else:
-        # Append new section before </body> if markers are not found
+        # Insert the new section before the last </body> if markers are not found.
         # This might happen if the initial HTML doesn't have the markers
-        body_end_tag = '</body>'
-        if body_end_tag in content:
-            content = content.replace(body_end_tag, f'{full_new_section}\n{body_end_tag}')
+        body_end_idx = content.rfind('</body>')
+        if body_end_idx != -1:
+            content = f'{content[:body_end_idx]}{full_new_section}\n{content[body_end_idx:]}'
         else: # Fallback if no </body> tag, append to end (less ideal)
             content += f'\n{full_new_section}'
-        
-    with open(html_file, "w") as f:
-        f.write(content)
 
-def create_pnl_visualization(input_file=None, output_dir=None):
-    """Main function to create PML visualizations by year and update dashboard HTML."""
+    if content == original_content: # Unchanged: leave the file and its timestamp alone
+        return
+    # Write to a temporary file and swap it in, so readers never see a partial dashboard
+    tmp_file = html_file.with_name(html_file.name + '.tmp')
+    tmp_file.write_text(content)
+    os.replace(tmp_file, html_file)
+
+# Per-output-directory record of the input (by _input_cache_key) each yearly file was built from
+_YEARLY_SOURCES_FILE = 'yearly_sources.json'
+
+def _load_yearly_sources(viz_output_dir):
+    """Return {yearly HTML file name: input key it was built from} for viz_output_dir."""
+    sources_file = Path(viz_output_dir) / '.cache' / _YEARLY_SOURCES_FILE
+    if not sources_file.exists():
+        return {}
+    return json.loads(sources_file.read_text())
+
+def _save_yearly_sources(viz_output_dir, sources):
+    sources_file = Path(viz_output_dir) / '.cache' / _YEARLY_SOURCES_FILE
+    sources_file.parent.mkdir(parents=True, exist_ok=True)
+    sources_file.write_text(json.dumps(sources, sort_keys=True))
+
+def _input_cache_key(input_file):
+    """
+    Content hash of the input CSV and the float precision it is loaded with, identifying
+    visualizations built from the same data.
+    """
+    digest = hashlib.sha1(Path(input_file).read_bytes())
+    digest.update(PNL_FLOAT_DTYPE.encode())
+    return digest.hexdigest()[:16]
+
+def _load_cached_visualizations(cache_file):
+    """
+    Return the visualization files recorded in cache_file, or None if there is no cache
+    entry or any of the recorded files is missing.
+    """
+    if not cache_file.exists():
+        return None
+
+    viz_output_dir = cache_file.parent.parent
+    visualization_files = {}
+    for key, filename in json.loads(cache_file.read_text()):
+        output_path = viz_output_dir / filename
+        if not output_path.exists():
+            return None
+        visualization_files[key if key == "All Years" else int(key)] = output_path
+    return visualization_files
+
+def _save_visualization_cache(cache_file, visualization_files):
+    """Record the generated visualization files under cache_file, replacing older entries."""
+    cache_file.parent.mkdir(exist_ok=True)
+    for stale_file in cache_file.parent.glob('*.json'):
+        if stale_file.name != _YEARLY_SOURCES_FILE:
+            stale_file.unlink()
+    entries = [[key if key == "All Years" else int(key), Path(path).name]
+               for key, path in visualization_files.items()]
+    cache_file.write_text(json.dumps(entries))
+
+def _write_gzip_copy(file_path):
+    """Write a gzip-compressed copy of file_path next to it, as '<file_path>.gz'."""
+    with open(file_path, 'rb') as src, gzip.open(f'{file_path}.gz', 'wb', compresslevel=6) as dst:
+        shutil.copyfileobj(src, dst)
+
+def create_pnl_visualization(input_file=None, output_dir=None, use_cache=True, gzip_copy=False):
+    """
+    Main function to create PML visualizations by year and update dashboard HTML.
+    When use_cache is set and the input CSV content is unchanged since the last run,
+    the previously generated visualizations are reused instead of being rebuilt.
+    When gzip_copy is set, every generated HTML file also gets a precompressed '.gz'
+    copy that a web server can send with 'Content-Encoding: gzip'; otherwise any '.gz'
+    copies left by an earlier run are removed.
+    """
     if input_file is None:
         input_file = 'input/fake_pnl_IA.csv' 
     if output_dir is None:
         output_dir = 'output' 
 
-    os.makedirs(output_dir, exist_ok=True)
-    pnl_attr_dir = os.path.join(output_dir, "Pnl Attribution")
-    os.makedirs(pnl_attr_dir, exist_ok=True)
-
-    df = load_data(input_file)
+    output_dir = Path(output_dir)
+    pnl_attr_dir = output_dir / "Pnl Attribution"
+    pnl_attr_dir.mkdir(parents=True, exist_ok=True)
+
+    input_key = _input_cache_key(input_file) if Path(input_file).exists() else None
+    cache_file = pnl_attr_dir / '.cache' / f'{input_key}.json' if input_key is not None else None
+    visualization_files = None
+    if use_cache and cache_file is not None:
+        visualization_files = _load_cached_visualizations(cache_file)
+
+    if visualization_files is None:
+        # Sorted once here; both figure builders then use the frame without re-sorting
+        df = _sorted_by_date(load_data(input_file))
+        # Both figure builders group the same columns by level
+        level_groups = identify_level_columns(df)
+
+        # Years whose HTML was already built from this same input are only rebuilt when
+        # caching is off
+        visualization_files = create_yearly_visualizations(
+            df, pnl_attr_dir, source_key=input_key, force=not use_cache,
+            level_groups=level_groups,
+        )
 
-    visualization_files = create_yearly_visualizations(df, pnl_attr_dir)
+        all_years_viz_info = create_all_years_visualization(df, pnl_attr_dir, level_groups=level_groups)
+        if all_years_viz_info:
+            visualization_files.update(all_years_viz_info)
 
-    all_years_viz_info = create_all_years_visualization(df, pnl_attr_dir)
-    if all_years_viz_info:
-        visualization_files.update(all_years_viz_info)
+        # Recorded even when caching is off, so no entry for an older input outlives the rebuild
+        if cache_file is not None:
+            _save_visualization_cache(cache_file, visualization_files)
 
-    dashboard_file = os.path.join(output_dir, 'index.html')
-    if not os.path.exists(dashboard_file):
+    dashboard_file = output_dir / 'index.html'
+    if not dashboard_file.exists():
         # If index.html absolutely does not exist, create a minimal one with markers
         # The update_dashboard_html function will also handle this, but this is an earlier check.
         print(f"Dashboard HTML file {dashboard_file} not found. A basic one will be created by update_dashboard_html.")
 
     update_dashboard_html(dashboard_file, visualization_files)
 
+    # Refreshed on every run, cache hits included, so no '.gz' copy lags behind its HTML
+    for html_file in [*visualization_files.values(), dashboard_file]:
+        if gzip_copy:
+            _write_gzip_copy(html_file)
+        else:
+            Path(f'{html_file}.gz').unlink(missing_ok=True)
+
     return visualization_files
 
 if __name__ == "__main__":
@@ -1,3 +1,5 @@
+import re
+
 # special rules for handling specific mother metrics
 special_metric_rules = {
     "VaR": {
@@ -18,4 +20,9 @@ special_metric_rules = {
         "include_pattern": r"^CIMSensiBOR(\d+[DWMY])?",
         "exclude_pattern": r"(EUR)(\d+[DWMY])?", #TODO it still having CIMSensiBOREUR1W CIMSensiBOREUR1M
     },
-}
\ No newline at end of file
+}
+# The same rules with their patterns compiled once (case-insensitive, as they are applied)
+compiled_metric_rules = {
+    mother_metric: {kind: re.compile(pattern, re.IGNORECASE) for kind, pattern in rules.items() if pattern}
+    for mother_metric, rules in special_metric_rules.items()
+}
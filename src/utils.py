@@ -1,7 +1,139 @@
+import gzip
+import numpy as np
 import pandas as pd
-from typing import Optional
+import plotly.io as pio
+from plotly.offline import get_plotlyjs_version
+from typing import Optional, Union
 from pathlib import Path
 
+# pyarrow's multithreaded CSV reader is used when it is installed; the C parser otherwise
+try:
+    import pyarrow  # noqa: F401
+    CSV_ENGINE = 'pyarrow'
+except ImportError:
+    CSV_ENGINE = 'c'
+
+# tsdownsample's compiled LTTB is used for NaN-free series when it is installed
+try:
+    from tsdownsample import LTTBDownsampler
+except ImportError:
+    LTTBDownsampler = None
+
+
+# Column dtypes of the SGMR risk metric CSV, passed to read_csv so it skips inference
+SGMR_CSV_DTYPES = {
+    'consoValue': 'float64',
+    'limMaxValue': 'float64',
+    'limMinValue': 'float64',
+}
+
+# Standalone figure page: plotly.js is loaded once from the CDN, the figure is embedded
+# as an inert JSON block parsed natively by the browser, then handed to Plotly.newPlot.
+_FIGURE_HTML_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="utf-8" />
+    <script charset="utf-8" src="https://cdn.plot.ly/plotly-{plotlyjs_version}.min.js"></script>
+</head>
+<body>
+    <div id="figure" style="height:100%; width:100%;"></div>
+    <script type="application/json" id="figure-data">{payload}</script>
+    <script>
+        var fig = JSON.parse(document.getElementById('figure-data').textContent);
+        Plotly.newPlot('figure', fig.data, fig.layout, {{responsive: true}});
+    </script>
+</body>
+</html>
+"""
+
+
+def write_figure_html(fig, output_file: Union[str, Path], validate: bool = True) -> None:
+    """
+    Write a figure as a standalone HTML page that serializes it to JSON only once.
+
+    Args:
+        fig: Plotly figure or figure dict
+        output_file (Union[str, Path]): Path of the HTML file to write. A '.gz' suffix
+            (e.g. 'plot.html.gz') writes the page gzip-compressed, to be served with
+            'Content-Encoding: gzip'.
+        validate (bool): Whether to validate a figure dict before serializing it
+    """
+    # Keep '</script>' sequences inside string values from closing the JSON block early
+    payload = pio.to_json(fig, validate=validate).replace('</', '<\\/')
+    html = _FIGURE_HTML_TEMPLATE.format(plotlyjs_version=get_plotlyjs_version(), payload=payload)
+    if str(output_file).endswith('.gz'):
+        with gzip.open(output_file, 'wt', encoding='utf-8', compresslevel=6) as f:
+            f.write(html)
+    else:
+        with open(output_file, 'w', encoding='utf-8') as f:
+            f.write(html)
+
+
+def lttb_downsample(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Select the points kept by a Largest-Triangle-Three-Buckets downsample.
+
+    Args:
+        x (np.ndarray): Monotonic numeric x values (pass datetimes as int64)
+        y (np.ndarray): Values aligned with x
+        n_out (int): Number of points to keep
+
+    Returns:
+        np.ndarray: Sorted positional indices of the retained points. All indices
+        are returned when the series already has n_out points or fewer.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    if LTTBDownsampler is not None and np.isfinite(y).all():
+        return np.asarray(LTTBDownsampler().downsample(x, y, n_out=n_out), dtype=np.int64)
+
+    # First and last points are always kept; the interior is split into n_out - 2 buckets
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    kept = np.empty(n_out, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+
+    prev = 0
+    for i in range(n_out - 2):
+        start, stop = edges[i], edges[i + 1]
+        next_start = edges[i + 1]
+        next_stop = edges[i + 2] if i + 2 < len(edges) else n
+
+        next_y = y[next_start:next_stop]
+        next_y = next_y[np.isfinite(next_y)]
+        avg_x = x[next_start:next_stop].mean()
+        avg_y = next_y.mean() if next_y.size else y[prev]
+
+        # Pick the point forming the largest triangle with the previous pick and the next bucket's mean
+        area = np.abs((x[prev] - avg_x) * (y[start:stop] - y[prev])
+                      - (x[prev] - x[start:stop]) * (avg_y - y[prev]))
+        prev = start + int(np.argmax(np.nan_to_num(area, nan=-1.0)))
+        kept[i + 1] = prev
+
+    return kept
+
+
+def compact_string_columns(df: pd.DataFrame, max_unique_ratio: float = 0.5) -> pd.DataFrame:
+    """
+    Convert low-cardinality string columns to categoricals, in place.
+
+    Args:
+        df (pd.DataFrame): Frame to compact
+        max_unique_ratio (float): Columns whose distinct values make up less than this
+            share of the rows are converted
+
+    Returns:
+        pd.DataFrame: The same frame, for chaining
+    """
+    for col in df.select_dtypes(include=['object', 'string']).columns:
+        if df[col].nunique() < max_unique_ratio * len(df):
+            df[col] = df[col].astype('category')
+    return df
+
+
 class DataLoader:
     """Class to handle data loading and preprocessing operations."""
     
@@ -14,12 +146,20 @@ class DataLoader:
         
         Args:
             file_path (str): Path to the CSV file
-            **kwargs: Additional arguments to pass to pd.read_csv
+            **kwargs: Additional arguments to pass to pd.read_csv (the engine defaults
+                to pyarrow when it is installed, and dtype to SGMR_CSV_DTYPES)
             
         Returns:
             pd.DataFrame: Loaded and preprocessed data
         """
+        kwargs.setdefault('engine', CSV_ENGINE)
         try:
+            # Explicit dtypes for the known numeric columns skip type inference, and the
+            # date column is parsed while reading
+            header = pd.read_csv(file_path, nrows=0).columns
+            kwargs.setdefault('dtype', {col: dtype for col, dtype in SGMR_CSV_DTYPES.items() if col in header})
+            if 'consoValueDate' in header:
+                kwargs.setdefault('parse_dates', ['consoValueDate'])
             self.data = pd.read_csv(file_path, **kwargs)
             self._preprocess_data()
             return self.data
@@ -49,6 +189,10 @@ class DataLoader:
         numeric_cols = ['consoValue', 'limMaxValue', 'limMinValue']
         for col in numeric_cols:
             self.data[col] = pd.to_numeric(self.data[col], errors='coerce')
+
+        # Node and metric names repeat on every row; store each distinct name once
+        for col in ('stranaNodeName', 'rmRiskMetricName', 'consoMreMetricName'):
+            self.data[col] = self.data[col].astype('category')
     
     def validate_data(self) -> bool:
         """